@@ -0,0 +1,147 @@
+import os, sys, json, gzip, mmap, time, fcntl, sqlite3, argparse
+from contextlib import contextmanager
+from pathlib import Path
+
+class Archive:
+    """Append-only store of every generated output, one JSON record per article run.
+
+    Records are appended to segment-NNNNNN.jsonl.gz files, each record as its
+    own gzip member: a segment is a valid multi-member gzip (zcat/gzip.open
+    stream it as JSONL) while a single record can still be read by seeking to
+    its member. Segments rotate at `segment_bytes`. index.db maps article id
+    and date to (segment, offset, length). An flock around append + index
+    keeps several worker processes from interleaving writes.
+    """
+
+    def __init__(self, root, segment_bytes: int = 64 * 1024 * 1024):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.index = sqlite3.connect(str(self.root / "index.db"), timeout=30)
+        self.index.executescript("""
+        CREATE TABLE IF NOT EXISTS records (
+            article_id TEXT,
+            created_at INTEGER,
+            segment TEXT,
+            offset INTEGER,
+            length INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS records_article ON records (article_id);
+        CREATE INDEX IF NOT EXISTS records_created ON records (created_at);
+        """)
+        self.index.commit()
+
+    @contextmanager
+    def _locked(self):
+        with open(self.root / "archive.lock", "a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _segments(self) -> list[Path]:
+        return sorted(self.root.glob("segment-*.jsonl.gz"))
+
+    def _current_segment(self) -> Path:
+        segs = self._segments()
+        if segs and segs[-1].stat().st_size < self.segment_bytes:
+            return segs[-1]
+        n = int(segs[-1].name.split("-")[1].split(".")[0]) + 1 if segs else 1
+        return self.root / f"segment-{n:06d}.jsonl.gz"
+
+    def _trim(self, seg: Path):
+        """Cut seg back to the end of its last indexed record; call with the lock held.
+
+        A crash mid-append leaves a truncated (or unindexed) member at the end,
+        and a truncated member breaks gzip.open/zcat for the whole segment.
+        The job that wrote it was never marked posted, so it is archived again.
+        """
+        end = self.index.execute(
+            "SELECT COALESCE(MAX(offset + length), 0) FROM records WHERE segment=?", (seg.name,)
+        ).fetchone()[0]
+        if seg.stat().st_size > end:
+            print(f">> Archive: dropping {seg.stat().st_size - end} unindexed byte(s) at the end of {seg.name}", flush=True)
+            os.truncate(seg, end)
+
+    def append(self, article_id: str, record: dict) -> dict:
+        record = {"id": article_id, "created_at": int(time.time()), **record}
+        member = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        with self._locked():
+            segs = self._segments()
+            if segs:
+                self._trim(segs[-1])  # before rotating: a broken tail may be what pushed it past segment_bytes
+            seg = self._current_segment()
+            with open(seg, "ab") as f:
+                offset = f.tell()
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+            self.index.execute(
+                "INSERT INTO records (article_id, created_at, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+                (article_id, record["created_at"], seg.name, offset, len(member))
+            )
+            self.index.commit()
+        return record
+
+    def _read(self, segment: str, offset: int, length: int) -> dict:
+        with open(self.root / segment, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return json.loads(gzip.decompress(mm[offset:offset + length]))
+
+    def get(self, article_id: str) -> list[dict]:
+        """Every record for one article, oldest first (re-runs append, they never overwrite)."""
+        rows = self.index.execute(
+            "SELECT segment, offset, length FROM records WHERE article_id=? ORDER BY created_at, rowid", (article_id,)
+        ).fetchall()
+        return [self._read(*r) for r in rows]
+
+    def ids(self, since: int = 0, until: int | None = None) -> list[str]:
+        rows = self.index.execute(
+            "SELECT DISTINCT article_id FROM records WHERE created_at >= ? AND created_at <= ? ORDER BY created_at",
+            (since, until if until is not None else 2**62)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def iter_records(self, since: int = 0, until: int | None = None):
+        """Stream records in write order, one decompressed member at a time."""
+        # the index tells us which segments can hold the window; the rest are never opened
+        wanted = {r[0] for r in self.index.execute(
+            "SELECT DISTINCT segment FROM records WHERE created_at >= ? AND created_at <= ?",
+            (since, until if until is not None else 2**62)
+        )}
+        for seg in self._segments():
+            if seg.name not in wanted:
+                continue
+            with gzip.open(seg, "rt", encoding="utf-8") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    if rec["created_at"] < since or (until is not None and rec["created_at"] > until):
+                        continue
+                    yield rec
+
+    def close(self):
+        self.index.close()
+
+def _day(s: str | None) -> int | None:
+    return int(time.mktime(time.strptime(s, "%Y-%m-%d"))) if s else None
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Read the generated-output archive")
+    ap.add_argument("command", choices=["export", "get", "ids"])
+    ap.add_argument("article_id", nargs="?")
+    ap.add_argument("--root", default=str(Path(__file__).resolve().parent / "data" / "archive"))
+    ap.add_argument("--since", help="YYYY-MM-DD")
+    ap.add_argument("--until", help="YYYY-MM-DD")
+    args = ap.parse_args()
+
+    a = Archive(args.root)
+    since = _day(args.since) or 0
+    until = _day(args.until) + 86399 if args.until else None  # inclusive of that whole day
+    if args.command == "export":
+        for rec in a.iter_records(since, until):
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    elif args.command == "get":
+        for rec in a.get(args.article_id):
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False, indent=2) + "\n")
+    else:
+        print("\n".join(a.ids(since, until)))
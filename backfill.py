@@ -0,0 +1,152 @@
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from batch import run_prompts, wait_batch
+from db import init_db, claim_job, owned_jobs, release_lease, fail_job, set_job_state, LeaseLost
+from governor import GOVERNOR
+from llm import build_prompt, get_image_prompt
+from pipeline import Checkpoint, run_job
+from publisher.github_files import github_commit_files, github_file_sha, git_blob_sha
+
+def _fill(jobs, cps, name, build, llm_cfg, provider, poll_seconds):
+    """Write <name>.txt for every job missing it, from one batch.
+
+    The batch id is checkpointed as <name>.batch before polling, so a backfill
+    that is killed mid-wait picks the same (already paid for) batch back up.
+    Once a batch has finished the checkpoint is dropped; jobs it has no result
+    for are resubmitted.
+    """
+    todo = [j for j in jobs if not cps[j["id"]].exists(f"{name}.txt")]
+    results, fresh, pending = {}, [], {}
+    for j in todo:
+        cp = cps[j["id"]]
+        if cp.exists(f"{name}.batch"):
+            pending.setdefault(cp.read_text(f"{name}.batch"), []).append(j)
+        else:
+            fresh.append(j)
+    for batch_id, js in pending.items():
+        try:
+            results.update(wait_batch(batch_id, poll_seconds))
+        except RuntimeError as e:
+            print(f">> {e}", flush=True)
+        missing = [j for j in js if j["id"] not in results]
+        if missing:
+            print(f">> Batch {batch_id}: resubmitting {len(missing)} request(s) without a result", flush=True)
+            fresh.extend(missing)
+
+    def remember(batch_id):
+        for j in fresh:
+            cps[j["id"]].write(f"{name}.batch", batch_id)
+
+    results.update(run_prompts({j["id"]: build(j) for j in fresh}, llm_cfg, provider, poll_seconds, remember))
+    for j in todo:
+        if j["id"] in results:
+            cps[j["id"]].write(f"{name}.txt", results[j["id"]])
+        cps[j["id"]].remove(f"{name}.batch")  # finished either way; a dead id would be polled forever
+    print(f">> {name}: {sum(j['id'] in results for j in todo)} / {len(todo)} done", flush=True)
+
+def backfill_id() -> str:
+    """Lease owner for backfills on this host; stable across restarts, unlike worker_id()."""
+    return f"backfill:{socket.gethostname()}"
+
+def run_backfill(cfg, db_path, jobs_folder, max_articles: int) -> int:
+    """Catch up on the backlog in bulk.
+
+    Claims up to max_articles jobs, extracts them, sends every rewrite and
+    then every image prompt through one provider batch each (OpenAI Batch;
+    providers without one get a plain call per prompt), renders, commits all
+    posts in a single GitHub commit and finally posts/archives each article.
+    Jobs keep the normal state machine, so anything that fails here is
+    resumed by a regular run or the next backfill. Leases are held as
+    backfill_id(), so a restarted backfill on the same host takes its
+    unfinished jobs (and their pending batches) back first.
+    """
+    provider, poll_seconds = cfg.backfill.provider, cfg.backfill.poll_seconds
+    llm_cfg, bl = cfg.llm, cfg.backlog
+    me = backfill_id()
+
+    con = init_db(db_path)
+    # jobs a killed backfill on this host still holds come first: their batches may already be paid for
+    jobs = owned_jobs(con, me, cfg.backfill.lease_seconds)[:max_articles]
+    while len(jobs) < max_articles:
+        job = claim_job(con, me, cfg.backfill.lease_seconds, cfg.revenue_filter.min_score,
+                        bl.half_life_hours, bl.max_age_days)
+        if job is None:
+            break
+        jobs.append(job)
+    print(f">> Backfill: {len(jobs)} job(s) claimed, provider={provider}", flush=True)
+    cps = {j["id"]: Checkpoint(jobs_folder, j["id"]) for j in jobs}
+
+    def attempt(job, until):
+        try:
+            run_job(con, cfg, job, jobs_folder, until=until, owner=me)
+            return True
+        except LeaseLost as e:
+            # another worker owns it now; its state and attempts are that worker's business
+            print(f"Dropping job: {e}", flush=True)
+            return False
+        except Exception as e:
+            print(f"Job failed at '{job['state']}': {e} ({job['title']})", flush=True)
+            fail_job(con, job["id"], str(e), cfg.max_attempts)
+            return False
+
+    try:
+        live = [j for j in jobs if attempt(j, "extracted")]
+
+        # only jobs still at "extracted" need LLM work; later ones were rewritten by an earlier run
+        need = [j for j in live if j["state"] == "extracted"]
+        _fill(need, cps, "rewrite",
+              lambda j: build_prompt(cfg.brand_name, cfg.voice, cps[j["id"]].read_text("text.txt"), j["title"]),
+              llm_cfg, provider, poll_seconds)
+        need = [j for j in need if cps[j["id"]].exists("rewrite.txt")]
+        _fill(need, cps, "image_prompt",
+              lambda j: get_image_prompt(cfg.brand_name, cfg.voice, cps[j["id"]].read_text("rewrite.txt")),
+              llm_cfg, provider, poll_seconds)
+        for j in need:
+            if cps[j["id"]].exists("image_prompt.txt"):
+                try:
+                    set_job_state(con, j["id"], "rewritten", me)
+                    j["state"] = "rewritten"
+                except LeaseLost as e:
+                    print(f"Dropping job: {e}", flush=True)
+                    live.remove(j)
+
+        ready = [j for j in live if j["state"] != "extracted" and attempt(j, "rendered")]
+
+        # one commit for every post + hero instead of one per article
+        to_commit = [j for j in ready if j["state"] == "rendered"]
+        if to_commit:
+            target = cfg.publish
+            files = {}
+            for j in to_commit:
+                meta = cps[j["id"]].read_json("render.json")
+                files[meta["hero_rel"]] = cps[j["id"]].read_bytes("hero.webp")
+                files[meta["fname"]] = cps[j["id"]].read_bytes("post.md")
+            try:
+                # a backfill that died between the commit and the state updates must not commit them again
+                with ThreadPoolExecutor(max_workers=max(1, min(len(files), GOVERNOR.ceiling("github")))) as pool:
+                    on_branch = list(pool.map(lambda p: github_file_sha(target.repo, target.branch, target.token, p), files))
+                files = {p: data for (p, data), sha in zip(files.items(), on_branch) if sha != git_blob_sha(data)}
+                if files:
+                    github_commit_files(target.repo, target.branch, target.token, files,
+                                        f"Backfill: {len(to_commit)} articles with hero images")
+                else:
+                    print(">> Already on the branch, skipping commit", flush=True)
+                print(f">> Published {len(to_commit)} article(s) in one commit", flush=True)
+            except Exception as e:
+                print(f">> Batched commit failed: {e} (jobs stay 'rendered')", flush=True)
+                to_commit = []
+            for j in to_commit:
+                try:
+                    set_job_state(con, j["id"], "published", me)
+                    j["state"] = "published"
+                except LeaseLost as e:
+                    # the new owner finds the post on the branch and skips the commit
+                    print(f"Dropping job: {e}", flush=True)
+
+        posted = [j for j in ready if j["state"] == "published" and attempt(j, "posted")]
+        print(f">> Backfill done: {len(posted)} / {len(jobs)} posted", flush=True)
+        return len(posted)
+    finally:
+        for j in jobs:
+            release_lease(con, j["id"], me)
+        con.close()
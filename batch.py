@@ -0,0 +1,81 @@
+import io, json, time, dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from governor import GOVERNOR
+from llm import run_llm
+
+# Batch states after which polling stops.
+_DONE = {"completed", "failed", "expired", "cancelled"}
+
+def _client():
+    import openai
+    return openai.OpenAI()  # honours OPENAI_BASE_URL, so batch_stub.py can stand in for the real API
+
+def submit_batch(prompts: dict[str, str], llm_cfg) -> str:
+    """Upload one chat-completions request per prompt and start a batch; returns the batch id."""
+    lines = [
+        json.dumps({
+            "custom_id": cid,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": llm_cfg.openai_model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.7,
+                "max_tokens": llm_cfg.openai_max_tokens,
+            },
+        })
+        for cid, prompt in prompts.items()
+    ]
+    client = _client()
+    f = client.files.create(file=("batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))), purpose="batch")
+    b = client.batches.create(input_file_id=f.id, endpoint="/v1/chat/completions", completion_window="24h")
+    print(f">> Batch {b.id}: {len(prompts)} request(s) submitted", flush=True)
+    return b.id
+
+def batch_results(batch_id: str) -> dict[str, str] | None:
+    """{custom_id: completion text} for the requests that succeeded, or None while the batch is still running."""
+    client = _client()
+    b = client.batches.retrieve(batch_id)
+    if b.status not in _DONE:
+        counts = b.request_counts
+        print(f">> Batch {batch_id}: {b.status} ({counts.completed if counts else '?'}/{counts.total if counts else '?'})", flush=True)
+        return None
+    if b.status != "completed" or not b.output_file_id:
+        raise RuntimeError(f"batch {batch_id} ended as {b.status}")
+
+    out = {}
+    for line in client.files.content(b.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        resp = row.get("response") or {}
+        if row.get("error") or resp.get("status_code") != 200:
+            print(f"   {row.get('custom_id')}: failed -> {row.get('error') or resp.get('status_code')}", flush=True)
+            continue
+        out[row["custom_id"]] = resp["body"]["choices"][0]["message"]["content"].strip()
+    return out
+
+def wait_batch(batch_id: str, poll_seconds: float = 30) -> dict[str, str]:
+    """Poll until the batch finishes; RuntimeError if it ended without results."""
+    while True:
+        out = batch_results(batch_id)
+        if out is not None:
+            return out
+        time.sleep(poll_seconds)
+
+def run_prompts(prompts: dict[str, str], llm_cfg, provider: str, poll_seconds: float = 30, on_submit=None) -> dict[str, str]:
+    """Run many prompts: one async batch for "openai", concurrent run_llm calls for providers without a batch API.
+
+    on_submit(batch_id) lets the caller persist the id so a restarted backfill polls the same batch.
+    """
+    if not prompts:
+        return {}
+    if provider == "openai":
+        batch_id = submit_batch(prompts, llm_cfg)
+        if on_submit:
+            on_submit(batch_id)
+        return wait_batch(batch_id, poll_seconds)
+    cfg = dataclasses.replace(llm_cfg, provider=provider)
+    # concurrent calls; the governor keeps the provider's in-flight count at what it currently tolerates
+    with ThreadPoolExecutor(max_workers=max(1, min(len(prompts), GOVERNOR.ceiling(provider)))) as pool:
+        return dict(zip(prompts, pool.map(lambda p: run_llm(p, cfg), prompts.values())))
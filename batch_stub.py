@@ -0,0 +1,113 @@
+"""Local stand-in for the OpenAI Files + Batch endpoints, for exercising backfills offline.
+
+    python batch_stub.py --port 8089 &
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub python main.py --backfill 20
+
+Batches complete after --polls status checks. Each chat request is answered
+the way run_llm's "none" provider answers: the prompt's article text, trimmed.
+"""
+import json, time, uuid, argparse, threading, email.parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llm import run_llm
+from settings import LLMSettings
+
+FILES: dict[str, bytes] = {}
+BATCHES: dict[str, dict] = {}
+_LOCK = threading.Lock()
+
+def _answer(body: dict) -> dict:
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    text = run_llm(prompt, LLMSettings("none")) or prompt.strip().splitlines()[-1]
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex[:12], "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+    }
+
+def _complete(batch: dict):
+    out = []
+    for line in FILES[batch["input_file_id"]].decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        out.append(json.dumps({
+            "id": "batch_req_" + uuid.uuid4().hex[:12], "custom_id": req["custom_id"], "error": None,
+            "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": _answer(req["body"])},
+        }))
+    fid = "file-" + uuid.uuid4().hex[:24]
+    FILES[fid] = "\n".join(out).encode("utf-8")
+    batch.update(status="completed", output_file_id=fid, completed_at=int(time.time()),
+                 request_counts={"total": len(out), "completed": len(out), "failed": 0})
+
+class Handler(BaseHTTPRequestHandler):
+    polls_needed = 1
+
+    def _send(self, obj, status=200, raw: bytes | None = None):
+        data = raw if raw is not None else json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw is not None else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        if self.path.endswith("/files"):
+            # multipart/form-data: a "purpose" field and a "file" part
+            msg = email.parser.BytesParser().parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._body()
+            )
+            content = b""
+            for part in msg.get_payload():
+                if part.get_param("name", header="content-disposition") == "file":
+                    content = part.get_payload(decode=True)
+            fid = "file-" + uuid.uuid4().hex[:24]
+            with _LOCK:
+                FILES[fid] = content
+            return self._send({"id": fid, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                               "filename": "batch.jsonl", "purpose": "batch", "status": "processed"})
+        if self.path.endswith("/batches"):
+            req = json.loads(self._body())
+            bid = "batch_" + uuid.uuid4().hex[:24]
+            with _LOCK:
+                BATCHES[bid] = {"id": bid, "object": "batch", "endpoint": req["endpoint"], "errors": None,
+                                "input_file_id": req["input_file_id"], "completion_window": req["completion_window"],
+                                "status": "validating", "output_file_id": None, "error_file_id": None,
+                                "created_at": int(time.time()), "polls": 0,
+                                "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+            return self._send(BATCHES[bid])
+        self._send({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if "batches" in parts:
+            b = BATCHES.get(parts[-1])
+            if b is None:
+                return self._send({"error": {"message": "no such batch"}}, 404)
+            with _LOCK:
+                b["polls"] += 1
+                if b["status"] != "completed":
+                    b["status"] = "in_progress"
+                    if b["polls"] >= self.polls_needed:
+                        _complete(b)
+            return self._send({k: v for k, v in b.items() if k != "polls"})
+        if "files" in parts and parts[-1] == "content":
+            data = FILES.get(parts[-2])
+            if data is None:
+                return self._send({"error": {"message": "no such file"}}, 404)
+            return self._send(None, raw=data)
+        self._send({"error": {"message": f"unknown path {self.path}"}}, 404)
+
+    def log_message(self, fmt, *args):
+        print(">> stub:", fmt % args, flush=True)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local OpenAI Batch API stub")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--polls", type=int, default=1, help="status checks before a batch completes")
+    args = ap.parse_args()
+    Handler.polls_needed = args.polls
+    print(f">> Batch stub on http://127.0.0.1:{args.port}/v1", flush=True)
+    ThreadingHTTPServer(("127.0.0.1", args.port), Handler).serve_forever()
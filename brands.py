@@ -0,0 +1,56 @@
+import copy
+from pathlib import Path
+from publisher.jekyll_publisher import slugify
+
+def deep_merge(base: dict, override: dict) -> dict:
+    """Dicts merge key by key; anything else (lists included) in override replaces base."""
+    out = copy.deepcopy(base)
+    for k, v in (override or {}).items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = deep_merge(out[k], v)
+        else:
+            out[k] = copy.deepcopy(v)
+    return out
+
+def load_profiles(cfg: dict, data_folder: Path) -> list[dict]:
+    """One config dict per brand.
+
+    Without a `brands:` list the config is a single brand using data/content.db,
+    exactly as before. With one, each entry is deep-merged over the top-level
+    settings (voice, revenue_filter, tag_buckets, hashtags, publish, post…) and
+    gets its own DB, job checkpoints and relevance model, since "processed"
+    and "scored" are per-brand facts. Feeds and article text are shared.
+    """
+    data_folder = Path(data_folder)
+    brands = cfg.get("brands") or []
+    if not brands:
+        profiles = [copy.deepcopy(cfg)]
+        profiles[0]["paths"] = {
+            "db": data_folder / "content.db",
+            "jobs": data_folder / "jobs",
+            "model": data_folder / "relevance.npz",
+            "archive": data_folder / "archive",
+            "images": data_folder / "images",
+            "governor": data_folder / "governor.json",
+        }
+        return profiles
+
+    base = {k: v for k, v in cfg.items() if k != "brands"}
+    profiles = []
+    for b in brands:
+        p = deep_merge(base, b)
+        slug = slugify(p.get("brand_name", "brand")) or "brand"
+        p["paths"] = {
+            "db": data_folder / p.get("db", f"{slug}.db"),
+            "jobs": data_folder / "jobs" / slug,
+            "model": data_folder / f"{slug}-relevance.npz",
+            "archive": data_folder / "archive" / slug,
+            "images": data_folder / "images",  # shared: one generation serves every brand
+            "governor": data_folder / "governor.json",  # API limits are per account, not per brand
+        }
+        profiles.append(p)
+    return profiles
+
+def all_feeds(profiles: list) -> list[str]:
+    """Union of every brand's feeds (settings.Settings), first-seen order, each listed once."""
+    return list(dict.fromkeys(f for p in profiles for f in p.feeds))
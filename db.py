@@ -1,7 +1,14 @@
-import sqlite3, time
+import sqlite3, time, json, math
+
+# Columns added after the first release; init_db adds them to older databases.
+_MIGRATIONS = {
+    "potential": [("source", "TEXT"), ("published_at", "INTEGER"), ("relevance", "REAL"), ("gate", "INTEGER")],
+    "jobs": [("lease_owner", "TEXT"), ("lease_expires", "INTEGER")],
+}
 
 def init_db(db_path: str):
-    con = sqlite3.connect(str(db_path))
+    # generous busy timeout: several worker processes (or hosts) may share the file
+    con = sqlite3.connect(str(db_path), timeout=30)
     cur = con.cursor()
     cur.executescript("""
     CREATE TABLE IF NOT EXISTS processed (
@@ -17,17 +24,90 @@ def init_db(db_path: str):
         score INTEGER,
         pull_date INTEGER
     );
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        url TEXT,
+        title TEXT,
+        score INTEGER,
+        state TEXT,
+        attempts INTEGER DEFAULT 0,
+        error TEXT,
+        updated_at INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS host_sessions (
+        host TEXT PRIMARY KEY,
+        cookies TEXT,
+        warmed_at INTEGER
+    );
     """)
+    for table, cols in _MIGRATIONS.items():
+        have = {r[1] for r in cur.execute(f"PRAGMA table_info({table})")}
+        for name, typ in cols:
+            if name not in have:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {typ}")
+    cur.execute("CREATE INDEX IF NOT EXISTS potential_score ON potential (score)")
     con.commit()
     return con
 
-def potential_articles(con, uid: str, url: str, title: str, score: int):
+def potential_articles(con, uid: str, url: str, title: str, score: int, source: str | None = None, published_at: int | None = None):
     con.execute(
-        "INSERT OR IGNORE INTO potential (id, url, title, score, pull_date) VALUES (?, ?, ?, ?, ?)",
-        (uid, url, title, score, int(time.time()))
+        "INSERT OR IGNORE INTO potential (id, url, title, score, pull_date, source, published_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (uid, url, title, score, int(time.time()), source, published_at)
     )
     con.commit()
 
+def set_relevance(con, uid: str, relevance: float, gate: bool):
+    """Record the second-pass verdict; gated-out rows keep their keyword score but leave the backlog."""
+    con.execute("UPDATE potential SET relevance=?, gate=? WHERE id=?", (relevance, int(gate), uid))
+    con.commit()
+
+def relevance_training_rows(con, min_score: int, after: tuple[int, int]) -> tuple[list[str], list[int], tuple[int, int]]:
+    """(titles, labels, cursor) for rows added after `after`: processed items are 1, low-score potential rows 0.
+
+    The cursor is (processed rowid, potential rowid) rather than a timestamp:
+    rows written in the same second as the last run's newest are still picked up.
+    """
+    pos = con.execute("SELECT rowid, title FROM processed WHERE rowid > ?", (after[0],)).fetchall()
+    neg = con.execute(
+        "SELECT rowid, title FROM potential WHERE score < ? AND rowid > ? "
+        "AND id NOT IN (SELECT id FROM processed)",
+        (min_score, after[1])
+    ).fetchall()
+    cursor = (max([after[0]] + [r for r, _ in pos]), max([after[1]] + [r for r, _ in neg]))
+    return [t or "" for _, t in pos] + [t or "" for _, t in neg], [1] * len(pos) + [0] * len(neg), cursor
+
+def relevance_replay_rows(con, min_score: int, upto: tuple[int, int], limit: int) -> tuple[list[str], list[int]]:
+    """A random sample (up to `limit` per class) of rows already learned from, i.e. at or before the cursor `upto`."""
+    pos = con.execute("SELECT title FROM processed WHERE rowid <= ? ORDER BY RANDOM() LIMIT ?", (upto[0], limit)).fetchall()
+    neg = con.execute(
+        "SELECT title FROM potential WHERE score < ? AND rowid <= ? "
+        "AND id NOT IN (SELECT id FROM processed) ORDER BY RANDOM() LIMIT ?",
+        (min_score, upto[1], limit)
+    ).fetchall()
+    return [t or "" for t, in pos] + [t or "" for t, in neg], [1] * len(pos) + [0] * len(neg)
+
+def was_scored(con, uid: str) -> bool:
+    return con.execute("SELECT 1 FROM potential WHERE id=?", (uid,)).fetchone() is not None
+
+def backlog(con, min_score: int, limit: int, half_life_hours: float = 24.0, max_age_days: float = 7.0) -> list[tuple[str, str, int]]:
+    """Unprocessed, not-yet-started potential rows as (title, url, score), best first.
+
+    Priority is score * 0.5 ** (age / half_life), age measured from the feed's
+    publish time (or when we first saw the item if the feed had no date).
+    """
+    now = time.time()
+    rows = con.execute(
+        "SELECT title, url, score, COALESCE(published_at, pull_date) FROM potential "
+        "WHERE score >= ? AND COALESCE(gate, 1) = 1 AND COALESCE(published_at, pull_date) >= ? "
+        "AND id NOT IN (SELECT id FROM processed) AND id NOT IN (SELECT id FROM jobs)",
+        (min_score, int(now - max_age_days * 86400))
+    ).fetchall()
+    def priority(row):
+        age_h = max(0.0, now - row[3]) / 3600
+        return row[2] * math.pow(0.5, age_h / half_life_hours)
+    rows.sort(key=priority, reverse=True)
+    return [(t, u, s) for t, u, s, _ in rows[:limit]]
+
 def was_processed(con, uid: str) -> bool:
     return con.execute("SELECT 1 FROM processed WHERE id=?", (uid,)).fetchone() is not None
 
@@ -37,3 +117,105 @@ def mark_processed(con, uid: str, url: str, title: str):
         (uid, url, title, int(time.time()))
     )
     con.commit()
+
+def load_host_sessions(con) -> dict:
+    rows = con.execute("SELECT host, cookies, warmed_at FROM host_sessions").fetchall()
+    return {h: {"cookies": json.loads(c or "[]"), "warmed_at": w or 0} for h, c, w in rows}
+
+def save_host_session(con, host: str, cookies: str, warmed_at: int):
+    con.execute(
+        "INSERT OR REPLACE INTO host_sessions (host, cookies, warmed_at) VALUES (?, ?, ?)",
+        (host, cookies, warmed_at)
+    )
+    con.commit()
+
+def get_job(con, uid: str) -> dict | None:
+    row = con.execute("SELECT id, url, title, score, state, attempts FROM jobs WHERE id=?", (uid,)).fetchone()
+    return dict(zip(("id", "url", "title", "score", "state", "attempts"), row)) if row else None
+
+class LeaseLost(RuntimeError):
+    pass
+
+def set_job_state(con, uid: str, state: str, owner: str | None = None):
+    """Move the job on; with `owner` only while that worker still holds the lease (else LeaseLost)."""
+    if owner is None:
+        con.execute("UPDATE jobs SET state=?, error=NULL, updated_at=? WHERE id=?", (state, int(time.time()), uid))
+    else:
+        cur = con.execute(
+            "UPDATE jobs SET state=?, error=NULL, updated_at=? WHERE id=? AND lease_owner=?",
+            (state, int(time.time()), uid, owner)
+        )
+        if cur.rowcount != 1:
+            con.rollback()
+            raise LeaseLost(f"lease on {uid} is held by another worker; not moving it to '{state}'")
+    con.commit()
+
+def fail_job(con, uid: str, error: str, max_attempts: int = 3):
+    """Record a failed attempt; after max_attempts the job is parked as 'failed'."""
+    con.execute(
+        "UPDATE jobs SET attempts=attempts+1, error=?, updated_at=?, "
+        "state=CASE WHEN attempts+1 >= ? THEN 'failed' ELSE state END WHERE id=?",
+        (error, int(time.time()), max_attempts, uid)
+    )
+    con.commit()
+
+def claim_job(con, worker: str, lease_seconds: int, min_score: int, half_life_hours: float = 24.0, max_age_days: float = 7.0) -> dict | None:
+    """Atomically lease the next job for `worker`, or None when there is nothing left.
+
+    Unfinished jobs whose lease is free or expired come first (crashed workers'
+    work is reclaimed), then the best backlog item is promoted to a new job.
+    BEGIN IMMEDIATE takes the write lock up front so two claimers never pick
+    the same row.
+    """
+    now = int(time.time())
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        row = con.execute(
+            "SELECT id FROM jobs WHERE state NOT IN ('posted', 'failed') "
+            "AND id NOT IN (SELECT id FROM processed) "
+            "AND (lease_owner IS NULL OR lease_expires < ?) ORDER BY updated_at LIMIT 1",
+            (now,)
+        ).fetchone()
+        uid = row[0] if row else None
+        if uid is None:
+            best = backlog(con, min_score, 1, half_life_hours, max_age_days)
+            if best:
+                title, url, score = best[0]
+                uid = con.execute("SELECT id FROM potential WHERE url=?", (url,)).fetchone()[0]
+                con.execute(
+                    "INSERT INTO jobs (id, url, title, score, state, updated_at) VALUES (?, ?, ?, ?, 'selected', ?)",
+                    (uid, url, title, score, now)
+                )
+        if uid is not None:
+            con.execute("UPDATE jobs SET lease_owner=?, lease_expires=? WHERE id=?", (worker, now + lease_seconds, uid))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return get_job(con, uid) if uid else None
+
+def renew_lease(con, uid: str, worker: str, lease_seconds: int) -> bool:
+    """Heartbeat; False means the lease expired and another worker may own the job now."""
+    cur = con.execute(
+        "UPDATE jobs SET lease_expires=? WHERE id=? AND lease_owner=?",
+        (int(time.time()) + lease_seconds, uid, worker)
+    )
+    con.commit()
+    return cur.rowcount == 1
+
+def release_lease(con, uid: str, worker: str, retry_after: int = 0):
+    """Give the job back; with retry_after the lease is instead left to expire that many seconds from now."""
+    if retry_after > 0:
+        con.execute("UPDATE jobs SET lease_expires=? WHERE id=? AND lease_owner=?", (int(time.time()) + retry_after, uid, worker))
+    else:
+        con.execute("UPDATE jobs SET lease_owner=NULL, lease_expires=NULL WHERE id=? AND lease_owner=?", (uid, worker))
+    con.commit()
+
+def owned_jobs(con, worker: str, lease_seconds: int) -> list[dict]:
+    """Unfinished jobs still leased to `worker` (left by a run that was killed), with their leases renewed."""
+    rows = con.execute(
+        "SELECT id FROM jobs WHERE lease_owner=? AND state NOT IN ('posted', 'failed') "
+        "AND id NOT IN (SELECT id FROM processed) ORDER BY updated_at",
+        (worker,)
+    ).fetchall()
+    return [get_job(con, r[0]) for r in rows if renew_lease(con, r[0], worker, lease_seconds)]
@@ -0,0 +1,94 @@
+import feedparser, datetime
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+
+# Only these fields are read downstream; everything else in an entry
+# (content:encoded, media:*, enclosures…) is dropped as soon as it closes.
+_ENTRY_TAGS = {"item", "entry"}
+_DATE_TAGS = ("pubDate", "published", "updated", "date", "issued", "modified")
+
+def _local(tag: str) -> str:
+    # "{http://www.w3.org/2005/Atom}entry" -> "entry"
+    return tag.rsplit("}", 1)[-1] if "}" in tag else tag
+
+def _entry_from_element(el) -> dict:
+    out = {"title": "", "link": "", "guid": "", "published": ""}
+    for child in el:
+        name = _local(child.tag)
+        text = (child.text or "").strip()
+        if name == "title" and not out["title"]:
+            out["title"] = text
+        elif name == "link":
+            # RSS: <link>url</link>   Atom: <link rel="alternate" href="url"/>
+            href = child.get("href")
+            rel = child.get("rel", "alternate")
+            if href and rel == "alternate" and not out["link"]:
+                out["link"] = href.strip()
+            elif text and not out["link"]:
+                out["link"] = text
+        elif name in ("guid", "id") and not out["guid"]:
+            out["guid"] = text
+        elif name in _DATE_TAGS and not out["published"]:
+            out["published"] = text
+    if not out["guid"]:
+        out["guid"] = out["link"]
+    return out
+
+def published_ts(value: str) -> int | None:
+    """RFC 822 (RSS) or ISO 8601 (Atom) date string -> unix seconds; None if unparseable."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    for parse in (parsedate_to_datetime, lambda v: datetime.datetime.fromisoformat(v.replace("Z", "+00:00"))):
+        try:
+            dt = parse(value)
+        except (TypeError, ValueError):
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=datetime.timezone.utc)
+        return int(dt.timestamp())
+    return None
+
+def parse_feed_stream(chunks, max_entries: int = 10) -> list[dict]:
+    """Incrementally parse RSS/Atom bytes, stopping after max_entries items.
+
+    Raises ET.ParseError on malformed XML so callers can fall back to feedparser.
+    """
+    parser = ET.XMLPullParser(events=("end",))
+    entries = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, el in parser.read_events():
+            if _local(el.tag) not in _ENTRY_TAGS:
+                continue
+            entries.append(_entry_from_element(el))
+            el.clear()
+            if len(entries) >= max_entries:
+                return entries
+    parser.close()
+    return entries
+
+def fetch_feed_entries(client, feed_url: str, max_entries: int = 10) -> list[dict]:
+    """Stream feed_url through parse_feed_stream; feedparser handles anything malformed."""
+    with client.stream("GET", feed_url) as r:
+        r.raise_for_status()
+        stream, seen = r.iter_bytes(), []
+        def _tee():
+            for chunk in stream:
+                seen.append(chunk)
+                yield chunk
+        try:
+            return parse_feed_stream(_tee(), max_entries)
+        except ET.ParseError:
+            # keep what was already read and drain the rest of the same stream
+            body = b"".join(seen) + b"".join(stream)
+    parsed = feedparser.parse(body)
+    return [
+        {
+            "title": e.get("title") or "",
+            "link": e.get("link") or "",
+            "guid": e.get("id") or e.get("link") or "",
+            "published": e.get("published") or e.get("updated") or "",
+        }
+        for e in parsed.entries[:max_entries]
+    ]
@@ -0,0 +1,256 @@
+"""Adaptive per-endpoint concurrency limits (AIMD), shared by every outbound API call in a process.
+
+Each endpoint (an LLM provider, the image API, GitHub, Buffer) gets its own
+in-flight limit. Every successful response adds 1/limit to it, so the limit
+grows by one per full window of successes. It is halved on a 429/503/5xx, a
+403 carrying rate-limit headers (GitHub's secondary limit), an error without
+a response, or latency drifting past latency_factor times the endpoint's
+baseline. Cuts happen at most once per round trip. Retry-After and
+rate-limit headers that report nothing left (x-ratelimit-remaining*) hold
+new requests until the reset; a 429 without either holds for a few round
+trips, doubling while throttling continues. A remaining count smaller than the limit caps
+the limit at that count.
+
+Limits are per process. Learned limits are saved to data/governor.json, so
+the next run starts where this one ended, and are written as Prometheus
+gauges to data/governor.prom.
+"""
+import os, re, json, time, threading, email.utils
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+import requests
+
+ENDPOINTS = ("openai", "grok", "ollama", "xai-images", "github", "buffer")
+
+def _seconds(value) -> float | None:
+    """Retry-After / reset header -> seconds from now: "12", "1.5", "6m0s", "250ms", an epoch or an HTTP date."""
+    if value is None:
+        return None
+    v = str(value).strip()
+    try:
+        n = float(v)
+        return max(0.0, n - time.time()) if n > 1e9 else n  # GitHub sends an epoch
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", v)
+    if parts and "".join(a + b for a, b in parts) == v:
+        return sum(float(n) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[u] for n, u in parts)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(v).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _rate_headers(headers) -> tuple[int | None, float | None]:
+    """(requests remaining, seconds until reset) from OpenAI/xAI or GitHub style headers."""
+    if not headers:
+        return None, None
+    for rem, reset in (("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+                       ("x-ratelimit-remaining", "x-ratelimit-reset")):
+        if headers.get(rem) is not None:
+            try:
+                return int(float(headers.get(rem))), _seconds(headers.get(reset))
+            except ValueError:
+                return None, None
+    return None, None
+
+def throttled(status: int | None, headers=None) -> bool:
+    """429/503, or a 403 that carries rate-limit information (GitHub's secondary rate limit)."""
+    if status in (429, 503):
+        return True
+    if status == 403 and headers:
+        return headers.get("retry-after") is not None or _rate_headers(headers)[0] == 0
+    return False
+
+class Slot:
+    """What the caller saw; filled in via observe() inside `with governor.slot(...)`."""
+    __slots__ = ("status", "headers")
+
+    def __init__(self):
+        self.status, self.headers = None, None
+
+    def observe(self, status: int | None, headers=None):
+        self.status, self.headers = status, headers
+
+class Limiter:
+    def __init__(self, name: str, initial: int = 2, lo: int = 1, hi: int = 16, latency_factor: float = 3.0):
+        self.name, self.lo, self.hi, self.latency_factor = name, lo, hi, latency_factor
+        self.limit = float(min(max(initial, lo), hi))
+        self.inflight = 0
+        self.hold_until = 0.0
+        self.latency = None     # EWMA, seconds
+        self.baseline = None    # uncongested latency estimate
+        self.counts = Counter()
+        self._streak = 0        # throttling cuts since the last success
+        self._cut_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        with self._cond:
+            while True:
+                wait = self.hold_until - time.monotonic()
+                if wait <= 0 and self.inflight < int(self.limit):
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.inflight += 1
+        return time.monotonic()
+
+    def _cut(self, now: float, reason: str) -> bool:
+        self.counts[reason] += 1
+        # one cut per round trip: the other requests already in flight saw the same congestion
+        if now - self._cut_at >= (self.latency or 0.0):
+            self.limit = max(float(self.lo), self.limit / 2)
+            self._cut_at = now
+            return True
+        return False
+
+    def release(self, started: float, status: int | None = None, headers=None, failed: bool = False):
+        now = time.monotonic()
+        took = now - started
+        with self._cond:
+            self.inflight -= 1
+            hold = _seconds(headers.get("retry-after")) if headers else None
+            remaining, reset = _rate_headers(headers)
+            if throttled(status, headers):
+                # without Retry-After, hold for a few round trips, doubling per cut (the others were already in flight)
+                if self._cut(now, "throttled"):
+                    self._streak += 1
+                    hold = hold if hold is not None else min(60.0, (self.latency or 1.0) * 2 ** self._streak)
+            elif failed or (status is not None and status >= 500):
+                self._cut(now, "errors")
+            else:
+                self._streak = 0
+                self.counts["ok"] += 1
+                self.latency = took if self.latency is None else 0.8 * self.latency + 0.2 * took
+                # fastest recent response; drifts up slowly so a provider that got slower for good is re-learned
+                self.baseline = took if self.baseline is None or took < self.baseline else self.baseline + 0.002 * (took - self.baseline)
+                if self.latency > self.latency_factor * self.baseline:
+                    self._cut(now, "slow")
+                else:
+                    self.limit = min(float(self.hi), self.limit + 1 / self.limit)
+            if remaining is not None:
+                if remaining <= 0:
+                    hold = max(hold or 0.0, reset or 1.0)
+                elif remaining < self.limit:
+                    self.limit = max(float(self.lo), float(remaining))
+            if hold:
+                if hold >= 1 and now + hold > self.hold_until:
+                    print(f">> [{self.name}] rate limited; holding {hold:.1f}s (limit {int(self.limit)})", flush=True)
+                self.hold_until = max(self.hold_until, now + hold)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        s = Slot()
+        started = self.acquire()
+        try:
+            yield s
+        except Exception:
+            self.release(started, s.status, s.headers, failed=s.status is None)
+            raise
+        self.release(started, s.status, s.headers)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "inflight": self.inflight,
+                    "latency_ms": round((self.latency or 0) * 1000, 1), "baseline_ms": round((self.baseline or 0) * 1000, 1),
+                    "ok": self.counts["ok"], "throttled": self.counts["throttled"],
+                    "errors": self.counts["errors"], "slow": self.counts["slow"]}
+
+class Governor:
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._settings = None
+        self._saved = {}
+        self.path = None
+
+    def configure(self, settings, path: Path | None = None):
+        """settings is a settings.GovernorSettings; path holds limits learned by earlier runs."""
+        with self._lock:
+            self._settings, self.path = settings, Path(path) if path else None
+            self._limiters.clear()
+            self._saved = {}
+            if self.path and self.path.exists():
+                try:
+                    self._saved = {k: v["limit"] for k, v in json.loads(self.path.read_text(encoding="utf-8")).items()}
+                except (ValueError, KeyError, TypeError):
+                    self._saved = {}
+
+    def limiter(self, name: str) -> Limiter:
+        with self._lock:
+            lim = self._limiters.get(name)
+            if lim is None:
+                s = self._settings
+                lo, initial, hi, factor = 1, 2, 16, 3.0
+                if s is not None:
+                    e = s.endpoints.get(name, s.default)
+                    lo, initial, hi, factor = e.min, e.initial, e.max, s.latency_factor
+                lim = self._limiters[name] = Limiter(name, int(self._saved.get(name, initial)), lo, hi, factor)
+            return lim
+
+    def slot(self, name: str):
+        return self.limiter(name).slot()
+
+    def ceiling(self, name: str) -> int:
+        """Upper bound on the endpoint's limit; sizes thread pools without creating a limiter."""
+        s = self._settings
+        return s.endpoints.get(name, s.default).max if s is not None else 16
+
+    def metrics(self) -> dict:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: lim.metrics() for name, lim in sorted(limiters.items())}
+
+    def save(self):
+        """Write data/governor.json (also the next run's starting limits) and governor.prom."""
+        m = self.metrics()
+        if not m:
+            return
+        for name, v in m.items():
+            print(f"   governor {name:<11} limit={v['limit']:<6} ok={v['ok']} throttled={v['throttled']} "
+                  f"errors={v['errors']} latency={v['latency_ms']}ms", flush=True)
+        if self.path is None:
+            return
+        merged = {}
+        if self.path.exists():
+            try:
+                merged = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                merged = {}
+        merged.update(m)
+        # per-process temp names: workers exiting together must not write into each other's file
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(merged, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
+        lines = []
+        for metric, key, kind in (("limit", "limit", "gauge"), ("inflight", "inflight", "gauge"),
+                                  ("latency_ms", "latency_ms", "gauge"), ("responses_ok", "ok", "counter"),
+                                  ("responses_throttled", "throttled", "counter"), ("responses_errors", "errors", "counter")):
+            lines.append(f"# TYPE governor_{metric} {kind}")
+            lines += [f'governor_{metric}{{endpoint="{name}"}} {v[key]}' for name, v in merged.items()]
+        tmp = self.path.with_suffix(f".prom.{os.getpid()}.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp.replace(self.path.with_suffix(".prom"))
+
+GOVERNOR = Governor()
+
+# Methods a throttled response can safely be retried for; anything else may already have had an effect.
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+def request(endpoint: str, method: str, url: str, retries: int | None = None, **kw) -> requests.Response:
+    """requests.request under the endpoint's limit; a throttled response is retried once the limiter's hold expires.
+
+    Only idempotent methods are retried by default (3 times). Pass retries for
+    a POST the endpoint is known to reject before acting on.
+    """
+    if retries is None:
+        retries = 3 if method.upper() in IDEMPOTENT else 0
+    for attempt in range(retries + 1):
+        with GOVERNOR.slot(endpoint) as s:
+            r = requests.request(method, url, **kw)
+            s.observe(r.status_code, r.headers)
+        if not throttled(r.status_code, r.headers) or attempt == retries:
+            return r
+        print(f">> [{endpoint}] {r.status_code}, retry {attempt + 1}/{retries}", flush=True)
+    return r
@@ -0,0 +1,110 @@
+import json, threading, time, httpx
+from urllib.parse import urlsplit
+from db import load_host_sessions, save_host_session
+from tape import now as clock
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+class HostPolicy:
+    """Per-host HTTP clients with persisted cookies and a minimum request interval.
+
+    One httpx client is kept per host for the whole run, so keep-alive/HTTP2
+    connections are reused between feed and article fetches. Cookies and the
+    last warm-up time live in the host_sessions table, so the site-root warm-up
+    only happens when a host's cookies are missing or older than session_ttl.
+    Sleeping is per host: requests to other hosts are never held up.
+    """
+
+    def __init__(self, headers: dict, min_interval: float = 3.0, session_ttl: int = 12 * 3600, timeout: int = 20):
+        self.headers = headers
+        self.min_interval = min_interval
+        self.session_ttl = session_ttl
+        self.timeout = timeout
+        self._con = None
+        self._sessions = {}   # host -> {"cookies": [...], "warmed_at": int}
+        self._clients = {}
+        self._next_slot = {}
+        self._dirty = set()
+        self._warm_locks = {}
+        self._lock = threading.Lock()
+
+    def attach(self, con, hosts=None):
+        """Load persisted sessions from con; `hosts` is a Settings.hosts overriding the pacing defaults."""
+        if hosts is not None:
+            self.min_interval, self.session_ttl = hosts.min_interval, hosts.session_ttl
+        self._con = con
+        self._sessions = load_host_sessions(con)
+
+    def wait(self, host: str):
+        """Block until this host's next request slot; slots are reserved under the lock."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def client(self, url: str, warm: bool = False) -> httpx.Client:
+        host = host_of(url)
+        with self._lock:
+            c = self._clients.get(host)
+            if c is None:
+                c = httpx.Client(http2=True, headers=self.headers, follow_redirects=True, timeout=self.timeout)
+                for ck in self._sessions.get(host, {}).get("cookies", []):
+                    c.cookies.set(ck["name"], ck["value"], domain=ck.get("domain", ""), path=ck.get("path", "/"))
+                self._clients[host] = c
+            warm_lock = self._warm_locks.setdefault(host, threading.Lock())
+        if warm:
+            # several feeds can share a host; only the first one pays for the warm-up
+            with warm_lock:
+                if self._stale(host):
+                    self.wait(host)
+                    c.get(f"{urlsplit(url).scheme or 'https'}://{host}/")
+                    with self._lock:
+                        self._sessions[host] = {"cookies": self._cookies(c), "warmed_at": int(clock())}
+                        self._dirty.add(host)
+        return c
+
+    def get(self, url: str, warm: bool = False, **kw) -> httpx.Response:
+        c = self.client(url, warm=warm)
+        self.wait(host_of(url))
+        r = c.get(url, **kw)
+        with self._lock:
+            self._dirty.add(host_of(url))
+        return r
+
+    def _stale(self, host: str) -> bool:
+        # a recent warm-up that yielded no cookies still counts; re-trying it every run is wasted
+        s = self._sessions.get(host)
+        if not s or not s.get("warmed_at"):
+            return True
+        return clock() - s.get("warmed_at", 0) > self.session_ttl  # the recording's clock when replaying
+
+    @staticmethod
+    def _cookies(c: httpx.Client) -> list[dict]:
+        return [{"name": k.name, "value": k.value, "domain": k.domain, "path": k.path} for k in c.cookies.jar]
+
+    def save(self):
+        """Persist cookies for hosts touched this run. Call from the thread that owns the DB connection."""
+        if self._con is None:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            for host in dirty:
+                c = self._clients.get(host)
+                s = self._sessions.setdefault(host, {"cookies": [], "warmed_at": 0})
+                if c is not None and c.cookies.jar:
+                    s["cookies"] = self._cookies(c)
+                rows.append((host, json.dumps(s["cookies"]), s["warmed_at"]))
+        for host, cookies, warmed_at in rows:
+            save_host_session(self._con, host, cookies, warmed_at)
+
+    def close(self):
+        self.save()
+        with self._lock:
+            for c in self._clients.values():
+                c.close()
+            self._clients.clear()
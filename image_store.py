@@ -0,0 +1,146 @@
+import json, hashlib, sqlite3
+from pathlib import Path
+from PIL import Image
+from img_gen import download_image
+from tape import now as clock
+
+def prompt_hash(prompt: str) -> str:
+    # whitespace/case differences between LLM runs shouldn't cost another generation
+    return hashlib.sha256(" ".join(prompt.lower().split()).encode("utf-8")).hexdigest()
+
+def dhash(path: Path, size: int = 8) -> str:
+    """64-bit difference hash as 16 hex chars; near-identical images differ in only a few bits."""
+    with Image.open(path) as img:
+        g = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+        px = list(g.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            bits = (bits << 1) | (px[row * (size + 1) + col] > px[row * (size + 1) + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS assets (
+        prompt_hash TEXT PRIMARY KEY,
+        article_id TEXT,
+        brand TEXT,
+        path TEXT,
+        tags TEXT,
+        phash TEXT,
+        created_at INTEGER,
+        used_at INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS assets_created ON assets (created_at)",
+    "CREATE INDEX IF NOT EXISTS assets_article ON assets (article_id)",
+    "CREATE TABLE IF NOT EXISTS generations (id INTEGER PRIMARY KEY, created_at INTEGER)",
+    "CREATE INDEX IF NOT EXISTS generations_created ON generations (created_at)",
+)
+
+class ImageStore:
+    """Generated base images (before watermark/title), kept on disk and indexed by prompt hash.
+
+    Shared by all brands: the same prompt never pays for a second generation,
+    and when the daily generation budget is spent a recent image from the
+    same tag bucket can stand in. Ages follow tape.now(), so a replay sees
+    the store as it was when recorded.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.root / "index.db"), timeout=30)
+        # workers open the store concurrently: check, migrate and seed inside one write transaction
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            fresh_log = self.db.execute("SELECT 1 FROM sqlite_master WHERE name='generations'").fetchone() is None
+            for stmt in _SCHEMA:
+                self.db.execute(stmt)
+            if "brand" not in {r[1] for r in self.db.execute("PRAGMA table_info(assets)")}:
+                self.db.execute("ALTER TABLE assets ADD COLUMN brand TEXT")
+            if fresh_log:
+                # stores from before the generation log: their assets are what today's budget already spent
+                self.db.execute("INSERT INTO generations (created_at) SELECT created_at FROM assets")
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+    def lookup(self, prompt: str, article_id: str | None = None, brand: str | None = None) -> Path | None:
+        """Stored image for this exact prompt, or for this brand's article (a re-run's new prompt still maps back).
+
+        Brands scoring the same link write their own prompts, so an article match never crosses brands.
+        """
+        row = self.db.execute(
+            "SELECT prompt_hash, path FROM assets WHERE prompt_hash=? OR (article_id=? AND brand=?) "
+            "ORDER BY created_at DESC LIMIT 1",
+            (prompt_hash(prompt), article_id, brand)
+        ).fetchone()
+        if row and (self.root / row[1]).exists():
+            self._touch(row[0])
+            return self.root / row[1]
+        return None
+
+    def add_from_url(self, prompt: str, tags: list[str], url: str, article_id: str | None = None, brand: str | None = None) -> Path:
+        """Stream a freshly generated image to disk and index it."""
+        h = prompt_hash(prompt)
+        path = download_image(url, self.root / f"{h[:2]}" / f"{h}.img")
+        now = int(clock())
+        self.db.execute(
+            "INSERT OR REPLACE INTO assets (prompt_hash, article_id, brand, path, tags, phash, created_at, used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (h, article_id, brand, str(path.relative_to(self.root)), json.dumps(sorted(tags)), dhash(path), now, now)
+        )
+        self.db.commit()
+        return path
+
+    def generated_since(self, since: int) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM generations WHERE created_at >= ?", (since,)).fetchone()[0]
+
+    def reserve(self, budget: int, since: int) -> int | None:
+        """Claim one generation out of `budget` since `since`; its id, or None when they are all taken.
+
+        BEGIN IMMEDIATE makes the count and the claim one step, so workers and
+        brands sharing the store can't overshoot the cap between them.
+        """
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            if self.generated_since(since) >= budget:
+                self.db.rollback()
+                return None
+            rid = self.db.execute("INSERT INTO generations (created_at) VALUES (?)", (int(clock()),)).lastrowid
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return rid
+
+    def release(self, rid: int):
+        """Hand back a reserved generation that was never made."""
+        self.db.execute("DELETE FROM generations WHERE id=?", (rid,))
+        self.db.commit()
+
+    def recent_for_tags(self, tags: list[str], max_age_days: float = 30) -> Path | None:
+        """Least-recently-used recent asset sharing a tag bucket, skipping near-duplicates of the last one handed out."""
+        rows = self.db.execute(
+            "SELECT prompt_hash, path, tags, phash FROM assets WHERE created_at >= ? ORDER BY used_at",
+            (int(clock() - max_age_days * 86400),)
+        ).fetchall()
+        last = self.db.execute("SELECT phash FROM assets ORDER BY used_at DESC LIMIT 1").fetchone()
+        want = set(tags)
+        matches = [(h, rel, ph) for h, rel, t, ph in rows
+                   if want & set(json.loads(t or "[]")) and (self.root / rel).exists()]
+        fresh = [m for m in matches if not (last and hamming(m[2], last[0]) <= 6)]
+        for h, rel, _ in (fresh or matches)[:1]:
+            self._touch(h)
+            return self.root / rel
+        return None
+
+    def _touch(self, h: str):
+        self.db.execute("UPDATE assets SET used_at=? WHERE prompt_hash=?", (int(clock()), h))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
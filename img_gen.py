@@ -1,6 +1,8 @@
-import math, os, requests
+import math, os, requests, tempfile
 from io import BytesIO
+from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
+from governor import request as governed_request
 
 IMAGE_GENERATION_URL = os.getenv("IMAGE_GENERATION_URL")
 API_KEY = os.getenv("XAI_API_KEY")
@@ -29,18 +31,44 @@ def cover_grok_watermark(img: Image.Image, text="Subvertec", frac=0.08) -> Image
     d.text((18, y0 + (bar_h - f.size)//2), text, fill=(255, 255, 255), font=f)
     return img
 
+def download_image(url: str, dest: Path, chunk: int = 64 * 1024) -> Path:
+    """Stream url to dest (via a temp file in the same folder, so dest is never half-written)."""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with requests.get(url, timeout=60, stream=True) as r:
+        r.raise_for_status()
+        with tempfile.NamedTemporaryFile(dir=dest.parent, delete=False) as tmp:
+            try:
+                for block in r.iter_content(chunk):
+                    tmp.write(block)
+            except BaseException:
+                tmp.close()
+                Path(tmp.name).unlink(missing_ok=True)
+                raise
+    Path(tmp.name).replace(dest)
+    return dest
+
+def load_cover(path: Path) -> Image.Image:
+    """A stored base image, decoded from disk and watermarked, ready for generate_hero_image."""
+    with Image.open(path) as img:
+        return cover_grok_watermark(img.convert("RGB"))
+
 def fetch_cover_grok(url: str) -> Image.Image:
-    r = requests.get(url, timeout=60); r.raise_for_status()
-    img = Image.open(BytesIO(r.content)).convert("RGB")
-    return cover_grok_watermark(img)
+    with tempfile.TemporaryDirectory() as d:
+        return load_cover(download_image(url, Path(d) / "cover"))
 
-def llm_image(url: str = IMAGE_GENERATION_URL, api_key: str = API_KEY, model: str = "grok-2-image", prompt: str = "") -> Image.Image:
+def request_image_url(url: str = IMAGE_GENERATION_URL, api_key: str = API_KEY, model: str = "grok-2-image", prompt: str = "") -> str:
+    """Ask the image endpoint for one generation; returns the (temporary) URL of the result."""
     headers = {"accept": "application/json", "Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     payload = {"model": model, "response_format": "url", "prompt": prompt}
-    resp = requests.post(url, headers=headers, json=payload, timeout=60)
+    # a throttled generation is rejected before anything is made (or billed), so it is safe to retry
+    resp = governed_request("xai-images", "POST", url, headers=headers, json=payload, timeout=60, retries=3)
     resp.raise_for_status()
     data = resp.json()
-    return fetch_cover_grok(data["data"][0]["url"])
+    return data["data"][0]["url"]
+
+def llm_image(url: str = IMAGE_GENERATION_URL, api_key: str = API_KEY, model: str = "grok-2-image", prompt: str = "") -> Image.Image:
+    return fetch_cover_grok(request_image_url(url, api_key, model, prompt))
 
 def _fit_text(draw, text, font, max_width):
     words, lines, cur = text.split(), [], []
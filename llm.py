@@ -1,5 +1,9 @@
-import os, re
-from manipulation import extract_article, clean_text, token_trim
+import re
+from manipulation import extract_article, clean_text, token_trim, sha1
+from db import potential_articles, set_relevance
+from relevance import update_model
+from tape import taped
+from governor import GOVERNOR
 
 def _create_snippet(article: str, char_count: int = 320) -> str:
     out, total = [], 0
@@ -13,38 +17,94 @@ def _create_snippet(article: str, char_count: int = 320) -> str:
 def _strip_md_headings(s: str) -> str:
     return re.sub(r'(?m)^\s*#{1,6}\s+', '', s).strip()
 
-def score_text(text: str, inc: list[str], exc: list[str]) -> int:
-    s, score = text.lower(), 0
-    for w in inc: 
-        if w in s: score += 1
-    for w in exc:
-        if w in s: score -= 2
-    return score
-
-def filter_revenue_aligned(candidates: list[tuple[str,str]], cfg: dict) -> list[tuple[str,str]]:
-    inc = [w.lower() for w in cfg.get("revenue_filter", {}).get("include_keywords", [])]
-    exc = [w.lower() for w in cfg.get("revenue_filter", {}).get("exclude_keywords", [])]
-    min_score = int(cfg.get("revenue_filter", {}).get("min_score", 2))
-    kept = []
+def score_text(text: str, inc, exc) -> int:
+    """+1 per include keyword present, -2 per exclude keyword; inc/exc are compiled settings.Keywords."""
+    s = text.lower()
+    return inc.count(s) - 2 * exc.count(s)
+
+def filter_revenue_aligned(candidates: list[tuple], cfg, con=None, pages: dict | None = None) -> list[tuple[str,str,int]]:
+    """Keyword-score (title, link, ...) candidates; with con, every score is saved to the backlog.
+
+    pages maps link -> extracted text (or the fetch error) for one ingest pass,
+    so brands scoring the same link share one fetch.
+    """
+    rf = cfg.revenue_filter
+    min_score = rf.min_score
+    pages = {} if pages is None else pages
+    kept, snippets = [], {}
     print(f">> Revenue filter: min_score={min_score}", flush=True)
-    for i, (title, link) in enumerate(candidates, 1):
-        try:
-            snippet = _create_snippet(extract_article(link))
-        except Exception as e:
-            print(f"   [{i}] fetch fail -> {e} (scoring title only)", flush=True)
+    for i, (title, link, *meta) in enumerate(candidates, 1):
+        if link not in pages:
+            try:
+                pages[link] = extract_article(link)
+            except Exception as e:
+                pages[link] = e
+        fetched = not isinstance(pages[link], Exception)
+        if fetched:
+            snippet = _create_snippet(pages[link])
+        else:
+            print(f"   [{i}] fetch fail -> {pages[link]} (scoring title only, re-scored next run)", flush=True)
             snippet = ""
-        score = score_text((title or "") + " " + snippet, inc, exc)
+        score = score_text((title or "") + " " + snippet, rf.include, rf.exclude)
         print(f"   [{i}] score={score} :: {title}", flush=True)
-        if score >= min_score: kept.append((title, link, score))
+        if con is not None and fetched:
+            # low scores are kept too: they stop the item being re-scored next run.
+            # A title-only score isn't saved, so a passing fetch error doesn't demote the article for good.
+            potential_articles(con, sha1(link), link, title, score, *meta)
+        if score >= min_score and (con is None or fetched):
+            kept.append((title, link, score))
+            snippets[link] = snippet
+    if con is not None and rf.use_llm_second_pass and kept:
+        kept = _second_pass(kept, snippets, cfg, con, min_score)
     kept.sort()
     print(f">> Revenue-aligned kept: {len(kept)} / {len(candidates)}", flush=True)
     return kept
 
+def _second_pass(kept, snippets, cfg, con, min_score):
+    """Local classifier over the whole batch; only its borderline band is sent to the LLM."""
+    rf = cfg.revenue_filter
+    low, high = rf.low, rf.high
+    model = update_model(con, min_score, cfg.paths.model)
+    if not model.ready(rf.min_examples):
+        print(f">> Second pass: classifier still learning (pos={model.n_pos}, neg={model.n_neg}); keyword pass only", flush=True)
+        return kept
+    probs = model.predict([title for title, _, _ in kept])
+    out, asked = [], 0
+    for (title, link, score), p in zip(kept, probs):
+        p = float(p)
+        if p >= high:
+            keep = True
+        elif p < low:
+            keep = False
+        else:
+            asked += 1
+            keep = llm_is_relevant(cfg, title, snippets.get(link, ""))
+        set_relevance(con, sha1(link), p, keep)
+        print(f"   p={p:.2f} {'keep' if keep else 'drop'} :: {title}", flush=True)
+        if keep:
+            out.append((title, link, score))
+    print(f">> Second pass kept: {len(out)} / {len(kept)} ({asked} sent to LLM)", flush=True)
+    return out
+
+def llm_is_relevant(cfg, title: str, snippet: str) -> bool:
+    """YES/NO gate; anything that isn't a clear NO (incl. provider "none") keeps the item."""
+    prompt = f"""You pick stories for {cfg.brand_name}.
+
+Audience: {cfg.voice.audience}
+
+Would this story be useful to that audience? Answer with exactly YES or NO.
+
+Title: {title}
+{snippet}
+"""
+    answer = run_llm(prompt, cfg.llm)
+    return not answer.strip().upper().startswith("NO")
+
 def get_image_prompt(brand, voice, ai_rewrite: str = "") -> str:
     return f"""You are {brand}'s creative lead. Take the input rewrite and create a relevant 2–3 sentence image prompt.
 
-Style: {voice.get('style')}
-Audience: {voice.get('audience')}
+Style: {voice.style}
+Audience: {voice.audience}
 
 {ai_rewrite}
 """
@@ -52,8 +112,8 @@ Audience: {voice.get('audience')}
 def build_prompt(brand, voice, article_text, title):
     return f"""You are {brand}'s tech editor. Rewrite the news in your own words (no quotes).
 
-Style: {voice.get('style')}
-Audience: {voice.get('audience')}
+Style: {voice.style}
+Audience: {voice.audience}
 
 Output: a single 4–6 sentence paragraph summary. No lists/bullets/headers.
 
@@ -63,33 +123,66 @@ ARTICLE:
 {article_text}
 """
 
-def run_llm(prompt: str, cfg: dict) -> str:
-    provider = cfg.get("provider","none")
+def run_llm(prompt: str, cfg) -> str:
+    """cfg is a settings.LLMSettings."""
+    provider = cfg.provider
     if provider == "openai":
         import openai
-        client = openai.OpenAI()
-        model = cfg["openai"].get("model","gpt-4o-mini")
-        max_tokens = cfg["openai"].get("max_tokens", 500)
-        resp = client.chat.completions.create(
-            model=model, messages=[{"role":"user","content":prompt}],
-            temperature=0.7, max_tokens=max_tokens,
-        )
-        return resp.choices[0].message.content.strip()
+        # no SDK retries: they would hide 429s from the governor and inflate the latency it measures
+        client = openai.OpenAI(max_retries=0)
+        model = cfg.openai_model
+        max_tokens = cfg.openai_max_tokens
+        retries = 3
+        for attempt in range(retries + 1):
+            try:
+                with GOVERNOR.slot("openai") as s:
+                    try:
+                        raw = client.chat.completions.with_raw_response.create(
+                            model=model, messages=[{"role":"user","content":prompt}],
+                            temperature=0.7, max_tokens=max_tokens,
+                        )
+                    except openai.APIStatusError as e:
+                        s.observe(e.status_code, e.response.headers)
+                        raise
+                    s.observe(raw.status_code, raw.headers)
+                return raw.parse().choices[0].message.content.strip()
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                # the limiter has already cut and, on a 429, holds new requests until the reset
+                if attempt == retries:
+                    raise
+                print(f">> [openai] {type(e).__name__}, retry {attempt + 1}/{retries}", flush=True)
     elif provider == "grok":
-        from xai_sdk import Client
-        from xai_sdk.chat import user
-        model = cfg["grok"].get("model", "grok-3-mini")
-        chat = Client(api_key=os.getenv("XAI_API_KEY")).chat.create(model=model)
-        chat.append(user(prompt))
-        return _strip_md_headings(chat.sample().content)
+        # gRPC, so the HTTP tape can't see it; recorded here instead
+        return taped("grok", cfg.grok_model + "\n" + prompt, lambda: _grok(prompt, cfg))
     elif provider == "ollama":
-        import subprocess
-        p = subprocess.run(
-            ["ollama","run",cfg["ollama"].get("model","llama3.1:8b")],
-            input=prompt.encode(), capture_output=True, check=False
-        )
-        return p.stdout.decode().strip()
+        return taped("ollama", cfg.ollama_model + "\n" + prompt, lambda: _ollama(prompt, cfg))
     else:
         m = re.search(r"ARTICLE:(.*)", prompt, re.S)
         article = clean_text(m.group(1)) if m else ""
         return token_trim(article, 1000)
+
+def _grok(prompt: str, cfg) -> str:
+    from xai_sdk import Client
+    from xai_sdk.chat import user
+    chat = Client(api_key=cfg.xai_api_key).chat.create(model=cfg.grok_model)
+    chat.append(user(prompt))
+    with GOVERNOR.slot("grok") as s:
+        try:
+            content = chat.sample().content
+        except Exception as e:
+            # gRPC status instead of HTTP: map the throttling ones so the governor backs off
+            code = e.code() if callable(getattr(e, "code", None)) else None
+            s.observe({"RESOURCE_EXHAUSTED": 429, "UNAVAILABLE": 503}.get(getattr(code, "name", ""), None))
+            raise
+        s.observe(200)
+    return _strip_md_headings(content)
+
+def _ollama(prompt: str, cfg) -> str:
+    import subprocess
+    with GOVERNOR.slot("ollama") as s:
+        p = subprocess.run(
+            ["ollama","run",cfg.ollama_model],
+            input=prompt.encode(), capture_output=True, check=False
+        )
+        s.observe(200 if p.returncode == 0 else 500)
+    return p.stdout.decode().strip()
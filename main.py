@@ -1,15 +1,17 @@
 
-import os, hashlib,datetime, socket, yaml
+import os, sys, time, socket, argparse, dataclasses, multiprocessing
 from pathlib import Path
 from dotenv import load_dotenv
-from img_gen import generate_hero_image, llm_image, IMAGE_GENERATION_URL
-from db import init_db, mark_processed, potential_articles
-from llm import filter_revenue_aligned, build_prompt, run_llm, get_image_prompt
-from post import post_to_buffer
-from manipulation import extract_article, format_outputs, pick_fresh_entries, auto_tags, render_template
-from bullets import extract_bullets, dedupe_bullets, fallback_bullets_from_summary
-from publisher.jekyll_publisher import github_commit_markdown, jekyll_permalink, build_front_matter_dict, front_matter_text
-from publisher.github_files import github_commit_files
+from db import init_db
+from llm import filter_revenue_aligned
+from manipulation import pick_fresh_entries, poll_feeds, HOSTS
+from brands import all_feeds
+from settings import load_settings, ConfigWatcher, ConfigError
+from worker import run_worker
+from backfill import run_backfill
+from tape import Tape, install
+import profiling
+from governor import GOVERNOR
 
 
 socket.setdefaulttimeout(10)
@@ -19,8 +21,7 @@ load_dotenv()
 BASE = Path(__file__).resolve().parent
 DATA_FOLDER = BASE / "data"
 TEMPLATES = BASE / "templates"
-ARTICLE_DOCS = BASE / "article_docs"
-for p in (DATA_FOLDER, TEMPLATES, ARTICLE_DOCS):
+for p in (DATA_FOLDER, TEMPLATES):
     Path(p).mkdir(parents=True, exist_ok=True)
 DB_PATH = DATA_FOLDER / "content.db"
 
@@ -28,152 +29,146 @@ print(">> Tech Content Engine starting…", flush=True)
 print(">> CWD:", os.getcwd(), flush=True)
 print(">> Base:", BASE, "Data:", DATA_FOLDER, "DB:", DB_PATH, flush=True)
 
-def main():
+def load_config() -> list:
+    """Validated, compiled settings per brand; raises ConfigError before anything is fetched."""
     print(">> Loading config.yaml …", flush=True)
-    cfg = yaml.safe_load((BASE / "config.yaml").read_text(encoding="utf-8"))
-    print(f">> Feeds: {len(cfg.get('feeds', []))}, provider: {cfg.get('llm',{}).get('provider')}", flush=True)
-
-    con = init_db(DB_PATH)
+    return load_settings(BASE / "config.yaml", DATA_FOLDER)
+
+def ingest(profiles: list):
+    """Poll every feed once, then score each brand's new entries into its potential backlog."""
+    feeds = all_feeds(profiles)
+    print(f">> Brands: {len(profiles)}, feeds: {len(feeds)}, provider: {profiles[0].llm.provider}", flush=True)
+    with profiling.stage("poll"):
+        polled = poll_feeds(profiles[0], feeds)
+
+    pages = {}  # link -> extracted text (or fetch error), for this pass only
+    for prof in profiles:
+        con = init_db(prof.paths.db)
+        print(f">> [{prof.brand_name}] DB: {prof.paths.db}", flush=True)
+        with profiling.stage("pick"):
+            candidates = pick_fresh_entries(prof, con, polled)
+        print(f">> Candidate articles found: {len(candidates)}", flush=True)
+
+        # 🔎 score only the new entries; everything scored lands in the potential backlog.
+        # brands scoring the same link share one fetch through pages.
+        with profiling.stage("score"):
+            filter_revenue_aligned(candidates, prof, con, pages)
+        con.close()
+
+def work(profiles: list, limit: int | None, drain: bool = False) -> int:
+    """Run each brand's jobs; without a limit a brand gets articles_per_run, or everything if drain."""
+    done = 0
+    for prof in profiles:
+        n = limit if limit is not None or drain else prof.articles_per_run
+        done += run_worker(prof, prof.paths.db, prof.paths.jobs, n)
+    return done
+
+def _attach_hosts(profiles: list):
+    # host cookies are shared by all brands; they live in the first brand's DB
+    con = init_db(profiles[0].paths.db)
+    HOSTS.attach(con, profiles[0].hosts)
+    # API limits are per account too: one governor for all brands, warm-started from the last run
+    GOVERNOR.configure(profiles[0].governor, profiles[0].paths.governor)
+    return con
+
+def _worker_process(limit):
+    profiles = load_config()
+    con = _attach_hosts(profiles)
+    try:
+        work(profiles, limit, drain=True)
+    finally:
+        GOVERNOR.save()
+        HOSTS.close()
+        con.close()
+
+def _for_replay(profiles: list, tape: Tape) -> list:
+    # no pacing against recorded responses, and backlog ages as they were when recorded
+    return [dataclasses.replace(p, hosts=dataclasses.replace(p.hosts, min_interval=0.0),
+                                backlog=dataclasses.replace(p.backlog, max_age_days=p.backlog.max_age_days + tape.shift / 86400))
+            for p in profiles]
+
+def main(workers: int = 1, worker_only: bool = False, limit: int | None = None, backfill: int = 0, watch: float = 0,
+         profile: str | None = None, record: str | None = None, replay: str | None = None):
+    """One run; with watch, repeat every `watch` seconds, picking up config.yaml edits between runs.
+
+    profile writes per-stage cProfile dumps and folded stacks under that folder;
+    record/replay capture a run's external traffic to a tape folder or run against one offline.
+    """
+    config_path, data, tape = BASE / "config.yaml", DATA_FOLDER, None
+    if replay:
+        tape = Tape.replay(replay)
+        config_path, data = tape.root / "config.yaml", tape.replay_data()
+    watcher = ConfigWatcher(config_path, data)
+    if record:
+        tape = Tape.record(record, config_path, data)
+    if tape:
+        install(tape)
+    if profile:
+        profiling.PROFILER = profiling.StageProfiler(Path(profile) / time.strftime("%Y%m%d-%H%M%S"))
+    if (tape or profile) and workers > 1:
+        print(">> --profile/--record/--replay hook this process only; running one worker (use --limit to size the run)", flush=True)
+        workers = 1
+    try:
+        while True:
+            run(_for_replay(watcher.profiles, tape) if replay else watcher.profiles, workers, worker_only, limit, backfill)
+            if not watch:
+                return
+            print(f">> Next run in {watch:.0f}s", flush=True)
+            time.sleep(watch)
+            watcher.poll()
+    finally:
+        if profiling.PROFILER:
+            profiling.PROFILER.close()
+        if tape:
+            tape.close()
+
+def run(profiles: list, workers: int = 1, worker_only: bool = False, limit: int | None = None, backfill: int = 0):
+    con = _attach_hosts(profiles)
     print(">> DB initialized", flush=True)
-
-    candidates = pick_fresh_entries(cfg, con)
-    print(f">> Candidate articles found: {len(candidates)}", flush=True)
-
-    # 🔎 keep only revenue-relevant stories
-    candidates = filter_revenue_aligned(candidates, cfg)
-    if not candidates:
-        print(">> No revenue-aligned candidates OR no fresh items found. Try lowering min_score or adding keywords.", flush=True)
-        return
-    
-    to_process = candidates[: cfg.get("articles_per_run", 1)]
-    print(f"Processing {len(to_process)} article(s).")
-
-    for title, link, score in to_process:
-        print(f"\n=== {title} ===\n{link}")
-        try:
-            art_text = extract_article(link)
-        except Exception as e:
-            print(f"Failed to fetch article: {e}")
-            continue
-
-        main_prompt = build_prompt(cfg["brand_name"], cfg["voice"], art_text, title)
-        rewritten = run_llm(main_prompt, cfg.get("llm", {"provider":"none"}))
-        gen_image_idea = get_image_prompt(cfg["brand_name"], cfg["voice"], rewritten)
-        image_prompt = run_llm(gen_image_idea, cfg.get("llm", {"provider": "none"}))
-        article_image = llm_image(url=IMAGE_GENERATION_URL, api_key=os.getenv("XAI_API_KEY"), model="grok-2-image", prompt=image_prompt)
-
-       # summary + bullets
-        summary = " ".join([s.strip() for s in rewritten.split("\n")[0:6] if s.strip()])
-
-        bullets = extract_bullets(rewritten)
-        if not bullets:
-            bullets = fallback_bullets_from_summary(summary, want=4)
-
-        bullets = dedupe_bullets(summary, bullets, max_count=5, sim=0.82)
-        if not bullets:  # absolute fallback so we never ship empty bullets
-            bullets = fallback_bullets_from_summary(summary, want=3)
-
-        buckets = cfg.get("tag_buckets", {})
-        tags = auto_tags(title + " " + summary, buckets)
-        print(f">> Auto-tags: {tags}", flush=True)
-
-        article_pack = {"title": title, "summary": summary, "bullets": bullets, "tags": tags}
-        out = format_outputs(article_pack, link, cfg.get("hashtags", []), cfg.get("platforms", {}), tags)
-
-        repo_owner_repo = os.getenv("GITHUB_PAGES_REPO", "user/repo")  # e.g., "Subvertec/subvertec.github.io"
-        repo_branch     = os.getenv("GITHUB_PAGES_BRANCH", "main")          # or "main"
-        repo_token      = os.getenv("GITHUB_TOKEN")                           # classic token with repo scope or a fine-grained token
-        site_base_url   = os.getenv("SITE_BASE_URL", "https://example.com") # your domain
-
-        now  = datetime.datetime.now()
-        # Build safe, Jekyll-friendly front matter
-        fm_dict, slug = build_front_matter_dict(
-            title=title,
-            summary=article_pack.get("summary",""),
-            tags=article_pack.get("tags", []),
-            categories=article_pack.get("tags", []),
-            date=now,  # keeps filename date and FM date in sync
-        )
-
-        hero_rel = f"assets/images/{slug}-hero.webp"
-        hero_bytes = generate_hero_image(
-            title=title,
-            summary=article_pack.get("summary",""),
-            tags=article_pack.get("tags", []),
-            size=(1600, 900),  # 16:9
-            brand=cfg.get("brand_name", "Subvertec"),
-            img_Image=article_image
-        )
-        git_dict = {hero_rel: hero_bytes}
-        
-        fm_dict["header"] = {
-            "image": "/" + hero_rel,
-            "overlay_color": "#000",
-            "overlay_filter": 0.3,
-        }
-        
-        # Add image paths to front matter (helps themes & social)
-        fm_dict["image"] = "/" + hero_rel
-        fm_dict["og_image"] = "/" + hero_rel
-        fm_dict["twitter_image"] = "/" + hero_rel
-        fm_dict["layout"] = "single"
-        
-        # Body (dedented so you don’t get weird leading spaces)
-        body_md = render_template(
-            cfg.get("post", {}).get("body_template", "jekyll_post.md.j2"),
-            {
-                "title": title,
-                "summary": article_pack["summary"],
-                "bullets": article_pack["bullets"],
-                "link": link,
-                "tags": article_pack.get("tags", []),
-                "image": "/" + hero_rel,
-            },
-        )
-
-        content = front_matter_text(fm_dict) + body_md.encode('utf-8')
-        
-
-        fname = f"_posts/{now.strftime('%Y-%m-%d')}-{slug}.md"
-        git_dict.update({fname: content})
-
-        # Commit the image
-        github_commit_files(
-            repo_owner_repo, repo_branch, repo_token, git_dict, f"Article: {title} and hero image for article"
-        )
-        
-        # github_commit_markdown(
-        #     repo_owner_repo, repo_branch, repo_token, fname, content, f"Publish: {title}"
-        # )
-
-        permalink = jekyll_permalink(
-            site_base_url, now, slug, os.getenv("JEKYLL_PERMALINK", "/:year/:month/:day/:title/")
-        )
-        print(">> Published:", permalink)
-
-        if os.getenv("BUFFER_ACCESS_TOKEN") and os.getenv("BUFFER_PROFILE_1"):
-            buf_profiles = [os.getenv("BUFFER_PROFILE_1")]
-            fb_text = out["facebook"] or (out["twitter"] or article_pack["summary"])
-            print(">> Posting to Buffer…")
-            print(post_to_buffer(os.getenv("BUFFER_ACCESS_TOKEN"), buf_profiles, fb_text, permalink))
-
-        # print("\n--- Twitter Draft ---\n", out["twitter"])
-        # print("\n--- Facebook Draft ---\n", out["facebook"])
-        # print("\n--- Instagram Draft ---\n", out["instagram"])
-        # print("\n--- TikTok Script ---\n", out["tiktok"])
-        print("\n--- doc_text Draft ---\n", out["doc_text"])
-
-        # if use_buffer and not dry_run and buffer_client:
-        #     result = buffer_client.post(text=out["facebook"] or out["twitter"], link=link)
-        #     print("Buffer result:", result)
-        
-        with open(f"{ARTICLE_DOCS}/{title}.doc_text", "w") as doc_text:
-            doc_text.write(out["doc_text"])
-        
-        for entry in candidates:
-            potential_articles(con, hashlib.sha1(entry[1].encode("utf-8")).hexdigest(), entry[1], entry[0], entry[2])            
-            
-        mark_processed(con, hashlib.sha1(link.encode("utf-8")).hexdigest(), link, title)
+    try:
+        if not worker_only:
+            ingest(profiles)
+
+        if backfill:
+            for prof in profiles:
+                run_backfill(prof, prof.paths.db, prof.paths.jobs, backfill)
+            return
+
+        # unfinished jobs from crashed runs are claimed first; they already paid for earlier stages
+        if workers <= 1:
+            if not work(profiles, limit):
+                print(">> No revenue-aligned candidates OR no fresh items found. Try lowering min_score or adding keywords.", flush=True)
+            return
+    finally:
+        GOVERNOR.save()
+        HOSTS.close()
+        con.close()
+
+    # spawn, not fork: children must not inherit the parent's open HTTP clients / DB handles
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_worker_process, args=(limit,)) for _ in range(workers)]
+    print(f">> Starting {workers} worker processes…", flush=True)
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Tech Content Engine")
+    ap.add_argument("--workers", type=int, default=1, help="worker processes; >1 drains the backlog unless --limit is set")
+    ap.add_argument("--worker", action="store_true", help="skip feed polling and only process claimed jobs (extra processes/hosts)")
+    ap.add_argument("--limit", type=int, default=None, help="max jobs per worker and brand (default: articles_per_run for a single worker)")
+    ap.add_argument("--backfill", type=int, default=0, metavar="N", help="process up to N backlog articles per brand through the provider batch API")
+    ap.add_argument("--watch", type=float, default=0, metavar="SECONDS", help="keep running, one run every SECONDS; config.yaml edits are picked up between runs")
+    ap.add_argument("--profile", nargs="?", const=str(DATA_FOLDER / "profile"), default=None, metavar="DIR", help="profile each stage; dumps go to DIR/<timestamp>/ (default data/profile)")
+    ap.add_argument("--record", metavar="TAPE", help="capture every external request/response of this run into the TAPE folder")
+    ap.add_argument("--replay", metavar="TAPE", help="re-run a recorded TAPE offline, against a copy of its data folder")
+    args = ap.parse_args()
+    if args.record and args.replay:
+        ap.error("--record and --replay are exclusive")
+    if args.watch and (args.record or args.replay):
+        ap.error("--watch can't be combined with --record/--replay")
+    try:
+        main(args.workers, args.worker, args.limit, args.backfill, args.watch, args.profile, args.record, args.replay)
+    except ConfigError as e:
+        sys.exit(f">> Invalid config.yaml:\n{e}")
@@ -1,6 +1,10 @@
-import requests, re, dotenv, feedparser, hashlib, httpx, time, random
+import re, dotenv, hashlib, httpx
 from pathlib import Path
-from db import was_processed
+from db import was_processed, was_scored
+from feeds import fetch_feed_entries, published_ts
+from hosts import HostPolicy, host_of
+from profiling import traced
+from concurrent.futures import ThreadPoolExecutor
 from readability import Document
 from bs4 import BeautifulSoup
 from jinja2 import Environment, FileSystemLoader
@@ -32,6 +36,8 @@ DEFAULT_HEADERS = {
     "Sec-Fetch-User": "?1",
 }
 
+# Shared across feed polling and article extraction; main() attaches the DB.
+HOSTS = HostPolicy(DEFAULT_HEADERS)
 
 TEMPLATES = Path(__file__).resolve().parent / "templates"
 
@@ -42,7 +48,7 @@ def sha1(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()
 
 def extract_article(url: str, timeout=20) -> str:
-    r = requests.get(url, timeout=timeout, headers=DEFAULT_HEADERS)
+    r = HOSTS.get(url, timeout=timeout)
     r.raise_for_status()
     doc = Document(r.text)
     html = doc.summary(html_partial=True)
@@ -83,18 +89,21 @@ def _normalize_hashtags(h) -> list[str]:
         return [x if x.startswith("#") else f"#{x}" for x in out]
     return []
 
+PLATFORM_DEFAULTS = {
+    "twitter":   {"enabled": True,  "max_len": 260, "add_link": True},
+    "facebook":  {"enabled": True,  "add_link": True},
+    "instagram": {"enabled": True,  "add_link": False},
+    "tiktok":    {"enabled": True,  "script_seconds": 45},
+    "doc_text":  {"enabled": True}
+}
+
 def normalize_platforms(p) -> dict:
-    defaults = {
-        "twitter":   {"enabled": True,  "max_len": 260, "add_link": True},
-        "facebook":  {"enabled": True,  "add_link": True},
-        "instagram": {"enabled": True,  "add_link": False},
-        "tiktok":    {"enabled": True,  "script_seconds": 45},
-        "doc_text":  {"enabled": True}
-    }
+    defaults = PLATFORM_DEFAULTS
 
     if isinstance(p, dict):
         out = {k: defaults.get(k, {}).copy() for k in defaults}
         for k, v in p.items():
+            k = "doc_text" if k == "doc" else k  # config.yaml calls it "doc"
             if isinstance(v, dict):
                 out.setdefault(k, {}).update(v)
             elif isinstance(v, bool):
@@ -116,6 +125,7 @@ def normalize_platforms(p) -> dict:
     return {k: defaults[k].copy() for k in defaults}
 
 def format_outputs(article, url, hashtags, platforms, tags):
+    """Per-platform post texts; `platforms` is normalize_platforms() output (Settings.platforms)."""
     tags = tags or []
     title = article.get("title", "").strip()
     summary = article.get("summary", "").strip()
@@ -123,8 +133,6 @@ def format_outputs(article, url, hashtags, platforms, tags):
     link = url or ""
     bullets_block = "\n".join([f"• {b}" for b in takeaways[:4]]) if takeaways else "• Key detail 1\n• Key detail 2"
 
-    platforms = normalize_platforms(platforms)
-
     # Turn bucket names into hash-tags: "AI_Automation" -> "#AI_Automation"
     base_hashtags = _normalize_hashtags(hashtags)
     tag_hashes = [f"#{t}" for t in tags]
@@ -183,72 +191,83 @@ def format_outputs(article, url, hashtags, platforms, tags):
 def load_template(name: str) -> str:
     return (TEMPLATES / name).read_text(encoding="utf-8")
 
-def _get_url_base(url_string: str) -> str:
-    base_url = "https://" + url_string.split("/")[2]
-    return base_url
-
-def pick_fresh_entries(cfg, con):
-    """Return a list of (title, link) for fresh items not yet processed."""
+def poll_feeds(cfg, feeds: list[str]) -> dict:
+    """Fetch each feed once: {feed_url: entries or the exception that stopped it}."""
+    max_entries = cfg.feed_max_entries
+    workers = cfg.hosts.workers
+    print(f">> Fetching {len(feeds)} feeds ({workers} in parallel, per-host pacing)…", flush=True)
+
+    def _fetch(feed_url):
+        c = HOSTS.client(feed_url, warm=True)
+        HOSTS.wait(host_of(feed_url))
+        return fetch_feed_entries(c, feed_url, max_entries)
+
+    polled = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        fetch = traced(_fetch)  # pool threads count toward the caller's profiling stage
+        futures = {u: pool.submit(fetch, u) for u in dict.fromkeys(feeds)}
+        for feed_url, fut in futures.items():
+            try:
+                polled[feed_url] = fut.result()
+            except Exception as ex:
+                polled[feed_url] = ex
+    HOSTS.save()
+    return polled
+
+def pick_fresh_entries(cfg, con, polled: dict | None = None):
+    """Return (title, link, feed_url, published_ts) for entries not yet processed or scored.
+
+    Anything already in the potential table is in the backlog and is not re-scored.
+    `polled` is a poll_feeds() result shared between brands; without it cfg's feeds are fetched here.
+    """
     items = []
-    feeds = cfg.get("feeds", [])
-    # ua = {"User-Agent": "SubvertecTechEngine/1.0 (+https://subvertec.com)"}
-    ua = DEFAULT_HEADERS
-    print(f">> Fetching {len(feeds)} feeds with 10s timeout…", flush=True)
+    feeds = cfg.feeds
+    if polled is None:
+        polled = poll_feeds(cfg, feeds)
+    # consumed in config order so candidate order stays stable
     for i, feed_url in enumerate(feeds, 1):
+        print(f"   [{i}/{len(feeds)}] {feed_url}", flush=True)
+        entries = polled.get(feed_url, [])
         try:
-            print(f"   [{i}/{len(feeds)}] GET {feed_url}", flush=True)
-            # r = requests.get(feed_url, headers=ua, timeout=10)
-            # r.raise_for_status()
-            # parsed = feedparser.parse(r.text)
-            with httpx.Client(http2=True, headers=DEFAULT_HEADERS, follow_redirects=True, timeout=20) as c:
-                base_url = _get_url_base(feed_url)
-                c.get(base_url)
-                time.sleep(random.randint(2, 5))
-                r = c.get(feed_url)
-                r.raise_for_status()
-                parsed = feedparser.parse(r.text)
+            if isinstance(entries, Exception):
+                raise entries
             count = 0
-            for e in parsed.entries[:10]:
+            for e in entries:
                 title = (e.get("title") or "").strip()
                 link = (e.get("link") or "").strip()
                 if not link or not title:
                     continue
                 uid = sha1(link)
-                if not was_processed(con, uid):
-                    items.append((title, link))
+                if not was_processed(con, uid) and not was_scored(con, uid):
+                    items.append((title, link, feed_url, published_ts(e.get("published"))))
                     count += 1
             print(f"      ok: {count} new candidate(s) from this feed", flush=True)
 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             print(f"      timeout: {feed_url} (skipping)", flush=True)
-        except requests.exceptions.SSLError as se:
-            print(f"      SSL error: {feed_url} -> {se} (skipping)", flush=True)
-        except requests.exceptions.RequestException as rexc:
-            print(f"      HTTP error: {feed_url} -> {rexc} (skipping)", flush=True)
+        except httpx.HTTPError as hexc:
+            print(f"      HTTP error: {feed_url} -> {hexc} (skipping)", flush=True)
         except Exception as ex:
             print(f"      parse error: {feed_url} -> {ex} (skipping)", flush=True)
 
     # Dedup by link
     seen, dedup = set(), []
-    for t, l in items:
-        if l in seen:
+    for item in items:
+        if item[1] in seen:
             continue
-        seen.add(l)
-        dedup.append((t, l))
+        seen.add(item[1])
+        dedup.append(item)
 
     print(f">> Total candidate articles found: {len(dedup)}", flush=True)
     return dedup
 
-def auto_tags(text: str, buckets: dict[str, list[str]], max_tags: int = 3) -> list[str]:
-    """Return up to max_tags bucket names whose keywords appear in text."""
+def auto_tags(text: str, buckets: dict, max_tags: int = 3) -> list[str]:
+    """Return up to max_tags bucket names whose keywords appear in text.
+
+    buckets maps a name to a compiled regex over its lower-cased keywords (Settings.tag_buckets).
+    """
     if not buckets:
         return []
     s = text.lower()
-    hits = []
-    for tag, kws in buckets.items():
-        for kw in kws:
-            if kw.lower() in s:
-                hits.append(tag)
-                break  # one hit per bucket is enough
     # deterministic order; cap to max_tags
-    return hits[:max_tags]
+    return [tag for tag, rx in buckets.items() if rx.search(s)][:max_tags]
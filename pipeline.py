@@ -0,0 +1,265 @@
+import json, shutil, datetime
+from pathlib import Path
+from db import set_job_state, mark_processed
+from img_gen import generate_hero_image, request_image_url, load_cover
+from image_store import ImageStore
+from llm import build_prompt, run_llm, get_image_prompt
+from batch import wait_batch
+from post import post_to_buffer
+from manipulation import extract_article, format_outputs, auto_tags, render_template
+from bullets import extract_bullets, dedupe_bullets, fallback_bullets_from_summary
+from publisher.jekyll_publisher import jekyll_permalink, build_front_matter_dict, front_matter_text
+from publisher.github_files import github_commit_files, github_file_sha, git_blob_sha
+from archive import Archive
+from profiling import stage as profiled
+from tape import now as clock
+
+# Order matters: a job's state is the last stage whose output is safely checkpointed.
+STAGES = ["selected", "extracted", "rewritten", "image_generated", "rendered", "published", "posted"]
+
+class Checkpoint:
+    """Stage outputs for one job, kept under <root>/<job id>/ until the job is posted."""
+
+    def __init__(self, root: Path, uid: str):
+        self.dir = Path(root) / uid
+
+    def write(self, name: str, data):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.dir / (name + ".tmp")
+        tmp.write_bytes(data.encode("utf-8") if isinstance(data, str) else data)
+        tmp.replace(self.dir / name)  # atomic: a crash never leaves half a checkpoint
+
+    def read_bytes(self, name: str) -> bytes:
+        return (self.dir / name).read_bytes()
+
+    def read_text(self, name: str) -> str:
+        return self.read_bytes(name).decode("utf-8")
+
+    def exists(self, name: str) -> bool:
+        return (self.dir / name).exists()
+
+    def read_json(self, name: str) -> dict:
+        return json.loads(self.read_text(name))
+
+    def remove(self, name: str):
+        (self.dir / name).unlink(missing_ok=True)
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+def _extract(cfg, job, cp):
+    cp.write("text.txt", extract_article(job["url"]))
+
+def _batched(cfg, job, cp, name: str) -> str | None:
+    """<name>.txt left by a backfill, waiting for its batch if one is still pending; None if there is nothing paid for."""
+    if cp.exists(f"{name}.txt"):
+        return cp.read_text(f"{name}.txt")
+    if not cp.exists(f"{name}.batch"):
+        return None
+    try:
+        text = wait_batch(cp.read_text(f"{name}.batch"), cfg.backfill.poll_seconds).get(job["id"])
+    except RuntimeError as e:
+        print(f">> {e}; running {name} directly", flush=True)
+        text = None
+    if text is not None:
+        cp.write(f"{name}.txt", text)
+    cp.remove(f"{name}.batch")
+    return text
+
+def _rewrite(cfg, job, cp):
+    # a backfill killed mid-way may already have paid for either prompt
+    rewritten = _batched(cfg, job, cp, "rewrite")
+    if rewritten is None:
+        rewritten = run_llm(build_prompt(cfg.brand_name, cfg.voice, cp.read_text("text.txt"), job["title"]), cfg.llm)
+        cp.write("rewrite.txt", rewritten)
+    if _batched(cfg, job, cp, "image_prompt") is None:
+        cp.write("image_prompt.txt", run_llm(get_image_prompt(cfg.brand_name, cfg.voice, rewritten), cfg.llm))
+
+def _generate_image(cfg, job, cp):
+    """Pick the base image: stored one for this prompt, else a new generation, else (over budget) a recent one."""
+    ic = cfg.images
+    prompt = cp.read_text("image_prompt.txt")
+    tags = auto_tags(job["title"] + " " + cp.read_text("rewrite.txt"), cfg.tag_buckets)
+    store = ImageStore(cfg.paths.images)
+    try:
+        path = store.lookup(prompt, job["id"], cfg.brand_name)
+        if path is not None:
+            print(">> Image: reusing stored generation for this prompt/article", flush=True)
+        elif (slot := store.reserve(ic.daily_budget, int(clock()) - 86400)) is not None:
+            try:
+                url = request_image_url(url=ic.url, api_key=ic.api_key, model="grok-2-image", prompt=prompt)
+            except Exception:
+                store.release(slot)  # nothing was generated; a failed download below still counts
+                raise
+            path = store.add_from_url(prompt, tags, url, job["id"], cfg.brand_name)
+        elif ic.reuse_on_budget_exhausted:
+            path = store.recent_for_tags(tags, ic.reuse_max_age_days)
+            if path is None:
+                raise RuntimeError(f"image budget spent and no recent image for tags {tags}")
+            print(f">> Image: budget spent, reusing {path.name} ({tags})", flush=True)
+        else:
+            raise RuntimeError("daily image generation budget spent")
+    finally:
+        store.close()
+    # only a pointer is checkpointed, relative to the store so a copied data folder still resolves it
+    cp.write("image.ref", path.relative_to(cfg.paths.images).as_posix())
+
+def _base_image(cfg, cp):
+    return load_cover(Path(cfg.paths.images) / cp.read_text("image.ref"))  # absolute refs from older runs join as-is
+
+def _render(cfg, job, cp):
+    title, link = job["title"], job["url"]
+    rewritten = cp.read_text("rewrite.txt")
+
+    # summary + bullets
+    summary = " ".join([s.strip() for s in rewritten.split("\n")[0:6] if s.strip()])
+
+    bullets = extract_bullets(rewritten)
+    if not bullets:
+        bullets = fallback_bullets_from_summary(summary, want=4)
+
+    bullets = dedupe_bullets(summary, bullets, max_count=5, sim=0.82)
+    if not bullets:  # absolute fallback so we never ship empty bullets
+        bullets = fallback_bullets_from_summary(summary, want=3)
+
+    tags = auto_tags(title + " " + summary, cfg.tag_buckets)
+    print(f">> Auto-tags: {tags}", flush=True)
+
+    article_pack = {"title": title, "summary": summary, "bullets": bullets, "tags": tags}
+    out = format_outputs(article_pack, link, list(cfg.hashtags), cfg.platforms, tags)
+
+    now = datetime.datetime.fromtimestamp(clock())  # the recording's date when replaying
+    # Build safe, Jekyll-friendly front matter
+    fm_dict, slug = build_front_matter_dict(
+        title=title,
+        summary=summary,
+        tags=tags,
+        categories=tags,
+        date=now,  # keeps filename date and FM date in sync
+    )
+
+    hero_rel = f"assets/images/{slug}-hero.webp"
+    hero_bytes = generate_hero_image(
+        title=title,
+        summary=summary,
+        tags=tags,
+        size=(1600, 900),  # 16:9
+        brand=cfg.brand_name,
+        img_Image=_base_image(cfg, cp),
+    )
+
+    fm_dict["header"] = {
+        "image": "/" + hero_rel,
+        "overlay_color": "#000",
+        "overlay_filter": 0.3,
+    }
+
+    # Add image paths to front matter (helps themes & social)
+    fm_dict["image"] = "/" + hero_rel
+    fm_dict["og_image"] = "/" + hero_rel
+    fm_dict["twitter_image"] = "/" + hero_rel
+    fm_dict["layout"] = "single"
+
+    body_md = render_template(
+        cfg.body_template,
+        {
+            "title": title,
+            "summary": summary,
+            "bullets": bullets,
+            "link": link,
+            "tags": tags,
+            "image": "/" + hero_rel,
+        },
+    )
+
+    fname = f"_posts/{now.strftime('%Y-%m-%d')}-{slug}.md"
+    permalink = jekyll_permalink(cfg.publish.site_base_url, now, slug, cfg.publish.permalink)
+
+    cp.write("hero.webp", hero_bytes)
+    cp.write("post.md", front_matter_text(fm_dict) + body_md.encode("utf-8"))
+    # the date/slug are frozen here so a resumed publish commits the same paths
+    cp.write("render.json", json.dumps({
+        "hero_rel": hero_rel, "fname": fname, "permalink": permalink,
+        "summary": summary, "bullets": bullets, "tags": tags, "outputs": out,
+    }))
+
+def _publish(cfg, job, cp):
+    meta = cp.read_json("render.json")
+    target = cfg.publish
+    repo_owner_repo, repo_branch, repo_token = target.repo, target.branch, target.token
+
+    post_md = cp.read_bytes("post.md")
+    # a worker that died between the commit and the state update must not publish twice
+    if github_file_sha(repo_owner_repo, repo_branch, repo_token, meta["fname"]) == git_blob_sha(post_md):
+        print(">> Already on the branch, skipping commit:", meta["fname"])
+    else:
+        github_commit_files(
+            repo_owner_repo, repo_branch, repo_token,
+            {meta["hero_rel"]: cp.read_bytes("hero.webp"), meta["fname"]: post_md},
+            f"Article: {job['title']} and hero image for article",
+        )
+    print(">> Published:", meta["permalink"])
+
+def _post(cfg, job, cp):
+    meta = cp.read_json("render.json")
+    out = meta["outputs"]
+    if cfg.buffer:
+        fb_text = out["facebook"] or (out["twitter"] or meta["summary"])
+        if cfg.buffer.dry_run:
+            print(f">> Buffer dry run, not posting to {len(cfg.buffer.profile_ids)} profile(s):\n{fb_text}\n{meta['permalink']}")
+        elif cp.exists("buffer.json"):
+            # posted before the archive write or state update failed; a resumed job must not post twice
+            print(">> Already posted to Buffer, skipping")
+        else:
+            print(">> Posting to Buffer…")
+            result = post_to_buffer(cfg.buffer.access_token, list(cfg.buffer.profile_ids), fb_text, meta["permalink"])
+            cp.write("buffer.json", json.dumps(result))
+            print(result)
+
+    print("\n--- doc_text Draft ---\n", out["doc_text"])
+    archive = Archive(cfg.paths.archive)
+    try:
+        archive.append(job["id"], {
+            "url": job["url"], "title": job["title"], "brand": cfg.brand_name,
+            "permalink": meta["permalink"], "post_path": meta["fname"],
+            "summary": meta["summary"], "bullets": meta.get("bullets", []), "tags": meta["tags"],
+            "rewrite": cp.read_text("rewrite.txt"), "image_prompt": cp.read_text("image_prompt.txt"),
+            "outputs": out,
+        })
+    finally:
+        archive.close()
+
+_STAGE_FNS = {
+    "extracted": _extract,
+    "rewritten": _rewrite,
+    "image_generated": _generate_image,
+    "rendered": _render,
+    "published": _publish,
+    "posted": _post,
+}
+
+def run_job(con, cfg, job: dict, root: Path, until: str = "posted", guard=None, owner: str | None = None) -> dict:
+    """Advance job through STAGES from its last checkpoint, stopping after `until`.
+
+    Exceptions propagate with the job left at its last completed stage, so the
+    next call resumes there instead of redoing paid LLM/image work. `guard`, if
+    given, is called before every stage and should raise if the job may no
+    longer be worked on (e.g. a worker's lease was lost). With `owner`, state
+    updates only land while that lease holder still owns the job.
+    """
+    cp = Checkpoint(root, job["id"])
+    for stage in STAGES[1:]:
+        if STAGES.index(job["state"]) >= STAGES.index(stage):
+            continue
+        if guard is not None:
+            guard()
+        with profiled(stage):
+            _STAGE_FNS[stage](cfg, job, cp)
+        set_job_state(con, job["id"], stage, owner)
+        job["state"] = stage
+        if stage == until:
+            break
+    if job["state"] == "posted":
+        mark_processed(con, job["id"], job["url"], job["title"])
+        cp.clear()
+    return job
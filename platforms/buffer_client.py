@@ -1,5 +1,5 @@
 import os
-import requests
+from governor import request
 from typing import List, Optional
 
 class BufferClient:
@@ -24,7 +24,7 @@ class BufferClient:
             if media:
                 for k, v in media.items():
                     payload[f"media[{k}]"] = v
-            r = requests.post(self.API, data=payload, timeout=20)
+            r = request("buffer", "POST", self.API, data=payload, timeout=20)
             try:
                 results.append(r.json())
             except Exception:
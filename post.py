@@ -1,4 +1,4 @@
-import requests
+from governor import request
 def post_to_buffer(access_token: str, profile_ids: list[str], text: str, link: str):
     url = "https://api.bufferapp.com/1/updates/create.json"
     payload = {
@@ -8,6 +8,6 @@ def post_to_buffer(access_token: str, profile_ids: list[str], text: str, link: s
         "now": True,
         "media[link]": link
     }
-    r = requests.post(url, data=payload, headers={"Authorization": f"Bearer {access_token}"}, timeout=15)
+    r = request("buffer", "POST", url, data=payload, headers={"Authorization": f"Bearer {access_token}"}, timeout=15)
     r.raise_for_status()
     return r.json()
\ No newline at end of file
@@ -0,0 +1,150 @@
+import sys, time, cProfile, pstats, threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# Set by main --profile; stage() is a no-op otherwise.
+PROFILER = None
+
+class StageProfiler:
+    """Per-stage cProfile data plus sampled stacks for flame graphs.
+
+    Every `with stage(name)` block is profiled into <out>/<name>.prof (open
+    with `python -m pstats` or snakeviz). A background thread also samples the
+    profiled thread's Python stack every `interval` seconds into
+    <out>/stacks.folded, one "stage;frame;frame count" line per unique stack,
+    which flamegraph.pl, speedscope or inferno read directly. Sampling sees
+    time spent blocked on I/O; cProfile's numbers are exact call counts.
+    Work a stage hands to a thread pool is only seen if it is wrapped with
+    traced(); it is then profiled and sampled as part of that stage.
+    """
+
+    def __init__(self, out_dir, interval: float = 0.005):
+        self.out = Path(out_dir)
+        self.out.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.wall = Counter()
+        self.calls = Counter()
+        self._profiles = {}
+        self._pooled = defaultdict(list)    # stage -> cProfile data from pool threads
+        self._active = None     # (thread id, [stage names]) while a stage runs
+        self._helpers = {}      # pool thread id -> stage it is working for
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="stage-sampler", daemon=True)
+        self._sampler.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        tid = threading.get_ident()
+        with self._lock:
+            busy = self._active is not None and self._active[0] != tid
+            nested = self._active is not None and self._active[0] == tid
+            if nested:
+                self._active[1].append(name)
+            elif not busy:
+                self._active = (tid, [name])
+        if busy:
+            # another thread is already in a stage; only one is profiled at a time
+            yield
+            return
+        # cProfile can't be enabled twice on one thread: a nested stage is sampled but counted in its parent
+        prof = None if nested else self._profiles.setdefault(name, cProfile.Profile())
+        t0 = time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+            with self._lock:
+                self.wall[name] += time.perf_counter() - t0
+                self.calls[name] += 1
+                self._active[1].pop()
+                if not self._active[1]:
+                    self._active = None
+
+    def current(self) -> str | None:
+        """The stage running on this thread, if any."""
+        with self._lock:
+            if self._active is not None and self._active[0] == threading.get_ident():
+                return self._active[1][-1]
+        return None
+
+    @contextmanager
+    def helper(self, name: str):
+        """Profile and sample a pool thread's task as part of stage `name`."""
+        tid = threading.get_ident()
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:  # another profiler is active on this thread; sampling still covers it
+            prof = None
+        with self._lock:
+            self._helpers[tid] = name
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+            with self._lock:
+                self._helpers.pop(tid, None)
+                if prof:
+                    self._pooled[name].append(prof)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = dict(self._helpers)
+                if self._active is not None:
+                    threads[self._active[0]] = self._active[1][-1]
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for tid, label in threads.items():
+                frame = frames.get(tid)
+                if frame is None or tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    co = frame.f_code
+                    stack.append(f"{Path(co.co_filename).stem}.{co.co_name}")
+                    frame = frame.f_back
+                stack.append(label)
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def close(self):
+        """Stop sampling, write the dumps and print a per-stage summary."""
+        self._stop.set()
+        self._sampler.join()
+        stats = {name: pstats.Stats(prof, *self._pooled.get(name, [])) for name, prof in self._profiles.items()}
+        for name, st in stats.items():
+            st.dump_stats(str(self.out / f"{name}.prof"))
+        with open(self.out / "stacks.folded", "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.stacks.items()):
+                f.write(f"{stack} {n}\n")
+        print(f">> Profile written to {self.out}", flush=True)
+        for name, secs in self.wall.most_common():
+            print(f"   {name:<16} {self.calls[name]:>4} call(s) {secs:9.3f}s", flush=True)
+        for name, st in stats.items():
+            with open(self.out / f"{name}.txt", "w", encoding="utf-8") as f:
+                st.stream = f
+                st.sort_stats("cumulative").print_stats(40)
+
+def stage(name: str):
+    return PROFILER.stage(name) if PROFILER is not None else nullcontext()
+
+def traced(fn):
+    """Wrap fn before handing it to a thread pool so its work counts toward the caller's current stage."""
+    p = PROFILER
+    name = p.current() if p is not None else None
+    if name is None:
+        return fn
+
+    def run(*args, **kw):
+        with p.helper(name):
+            return fn(*args, **kw)
+    return run
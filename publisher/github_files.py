@@ -1,4 +1,21 @@
-import base64, requests
+import base64, hashlib
+from governor import request
+
+def git_blob_sha(content: bytes) -> str:
+    """The object id git (and GitHub) assigns to a blob with these bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+def github_file_sha(owner_repo: str, branch: str, token: str, path: str) -> str | None:
+    """Blob sha of path on branch, or None if it does not exist."""
+    r = request(
+        "github", "GET", f"https://api.github.com/repos/{owner_repo}/contents/{path.lstrip('/')}",
+        headers={"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"},
+        params={"ref": branch}, timeout=20
+    )
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.json().get("sha")
 
 def github_commit_files(owner_repo: str, branch: str, token: str, files: dict[str, bytes], message: str):
     """Commit multiple files atomically using Git 'blobs/trees/commits/refs' endpoints."""
@@ -9,46 +26,36 @@ def github_commit_files(owner_repo: str, branch: str, token: str, files: dict[st
     }
     api = "https://api.github.com"
 
+    # Git objects are content-addressed and the ref update is fast-forward only,
+    # so every call here is safe to retry when GitHub throttles it.
+    def call(method, path, **kw):
+        r = request("github", method, f"{api}/repos/{owner}/{repo}/{path}", headers=H, timeout=20, retries=3, **kw)
+        r.raise_for_status()
+        return r.json()
+
     # 1) Get current branch HEAD commit & base tree
-    ref = requests.get(f"{api}/repos/{owner}/{repo}/git/ref/heads/{branch}", headers=H, timeout=20).json()
-    base_commit_sha = ref["object"]["sha"]
-    base_commit = requests.get(f"{api}/repos/{owner}/{repo}/git/commits/{base_commit_sha}", headers=H, timeout=20).json()
-    base_tree_sha = base_commit["tree"]["sha"]
-
-    # 2) Create blobs for each file
-    entries = []
-    for path, content in files.items():
-        blob = requests.post(
-            f"{api}/repos/{owner}/{repo}/git/blobs", headers=H, json={
-                "content": base64.b64encode(content).decode("ascii"),
-                "encoding": "base64",
-            }, timeout=20
-        ).json()
-        entries.append({"path": path.lstrip("/"), "mode": "100644", "type": "blob", "sha": blob["sha"]})
+    base_commit_sha = call("GET", f"git/ref/heads/{branch}")["object"]["sha"]
+    base_tree_sha = call("GET", f"git/commits/{base_commit_sha}")["tree"]["sha"]
+
+    # 2) Create blobs one at a time: GitHub's secondary rate limit punishes concurrent content creation
+    entries = [{"path": path.lstrip("/"), "mode": "100644", "type": "blob",
+                "sha": call("POST", "git/blobs", json={
+                    "content": base64.b64encode(content).decode("ascii"),
+                    "encoding": "base64",
+                })["sha"]}
+               for path, content in files.items()]
 
     # 3) Create a new tree from base + entries
-    tree = requests.post(
-        f"{api}/repos/{owner}/{repo}/git/trees", headers=H, json={
-            "base_tree": base_tree_sha,
-            "tree": entries
-        }, timeout=20
-    ).json()
+    tree = call("POST", "git/trees", json={"base_tree": base_tree_sha, "tree": entries})
 
     # 4) Create commit pointing to the new tree
-    commit = requests.post(
-        f"{api}/repos/{owner}/{repo}/git/commits", headers=H, json={
-            "message": message,
-            "tree": tree["sha"],
-            "parents": [base_commit_sha],
-        }, timeout=20
-    ).json()
+    commit = call("POST", "git/commits", json={
+        "message": message,
+        "tree": tree["sha"],
+        "parents": [base_commit_sha],
+    })
 
     # 5) Move branch ref to new commit (no force)
-    requests.patch(
-        f"{api}/repos/{owner}/{repo}/git/refs/heads/{branch}", headers=H, json={
-            "sha": commit["sha"],
-            "force": False
-        }, timeout=20
-    ).raise_for_status()
+    call("PATCH", f"git/refs/heads/{branch}", json={"sha": commit["sha"], "force": False})
 
     return commit
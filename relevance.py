@@ -0,0 +1,104 @@
+import re, zlib
+import numpy as np
+from pathlib import Path
+from db import relevance_training_rows, relevance_replay_rows
+
+MODEL_PATH = Path(__file__).resolve().parent / "data" / "relevance.npz"
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#-]*")
+
+def _tokens(text: str) -> list[str]:
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [a + " " + b for a, b in zip(words, words[1:])]
+
+class RelevanceModel:
+    """Hashed bag-of-words (uni+bigrams) logistic regression, trained on our own history.
+
+    Features are kept sparse as one flat (index, value) array plus row offsets,
+    so a whole batch is scored with a single gather + np.add.reduceat and no
+    dense matrix is ever built. zlib.crc32 is used for hashing because it is
+    stable across processes (str hash() is salted).
+    """
+
+    def __init__(self, dim: int = 1 << 18):
+        self.dim = dim
+        self.w = np.zeros(dim, dtype=np.float32)
+        self.b = 0.0
+        self.n_pos = self.n_neg = 0
+        self.trained = (0, 0)    # (processed, potential) rowids of the newest rows already learned from
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "RelevanceModel":
+        m = cls()
+        if path.exists():
+            z = np.load(path)
+            m.w, m.dim = z["w"], len(z["w"])
+            m.b, m.n_pos, m.n_neg = float(z["b"]), int(z["n_pos"]), int(z["n_neg"])
+            m.trained = tuple(int(x) for x in z["trained"])
+        return m
+
+    def save(self, path: Path = MODEL_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, w=self.w, b=self.b, n_pos=self.n_pos, n_neg=self.n_neg, trained=np.asarray(self.trained, dtype=np.int64))
+        tmp.replace(path)
+
+    def ready(self, min_each: int = 20) -> bool:
+        return self.n_pos >= min_each and self.n_neg >= min_each
+
+    def _featurize(self, texts: list[str]):
+        idx, starts = [], []
+        for t in texts:
+            starts.append(len(idx))
+            toks = _tokens(t) or [""]
+            idx.extend(zlib.crc32(tok.encode("utf-8")) % self.dim for tok in toks)
+        lengths = np.diff(np.append(starts, len(idx)))
+        idx = np.asarray(idx, dtype=np.int64)
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        vals = (1.0 / np.sqrt(lengths))[rows].astype(np.float32)
+        return idx, vals, rows, np.asarray(starts, dtype=np.int64)
+
+    def _logits(self, idx, vals, starts):
+        return np.add.reduceat(self.w[idx] * vals, starts) + self.b
+
+    def predict(self, texts: list[str]) -> np.ndarray:
+        """P(relevant) for every text, in one vectorized pass."""
+        if not texts:
+            return np.zeros(0)
+        idx, vals, _, starts = self._featurize(texts)
+        return 1.0 / (1.0 + np.exp(-self._logits(idx, vals, starts)))
+
+    def partial_fit(self, texts: list[str], labels: list[int], epochs: int = 30, lr: float = 2.0, l2: float = 1e-4):
+        """Full-batch gradient steps warm-started from the current weights."""
+        if not texts:
+            return
+        y = np.asarray(labels, dtype=np.float32)
+        # balance classes: we publish a handful of items per run but reject dozens
+        pos_w = len(y) / (2.0 * max(1.0, y.sum()))
+        neg_w = len(y) / (2.0 * max(1.0, len(y) - y.sum()))
+        sw = np.where(y > 0, pos_w, neg_w).astype(np.float32)
+        idx, vals, rows, starts = self._featurize(texts)
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-self._logits(idx, vals, starts)))
+            err = (p - y) * sw / len(y)
+            grad = np.zeros_like(self.w)
+            np.add.at(grad, idx, vals * err[rows])
+            touched = np.unique(idx)
+            grad[touched] += l2 * self.w[touched]
+            self.w -= lr * grad
+            self.b -= lr * float(err.sum())
+
+def update_model(con, min_score: int, path: Path = MODEL_PATH, replay: int = 200) -> RelevanceModel:
+    """Learn from rows added since the last run: processed = relevant, low-score potential = not."""
+    m = RelevanceModel.load(path)
+    texts, labels, cursor = relevance_training_rows(con, min_score, m.trained)
+    if texts:
+        # mix in a sample of older rows so a run that only saw rejects doesn't drag the bias down
+        old_texts, old_labels = relevance_replay_rows(con, min_score, m.trained, replay)
+        m.n_pos += sum(labels)
+        m.n_neg += len(labels) - sum(labels)
+        m.partial_fit(texts + old_texts, labels + old_labels)
+        m.trained = cursor
+        m.save(path)
+        print(f">> Relevance model: +{len(texts)} rows (pos={m.n_pos}, neg={m.n_neg})", flush=True)
+    return m
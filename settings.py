@@ -0,0 +1,412 @@
+"""Run settings: config.yaml validated and compiled once, before any network or LLM work.
+
+load_settings() returns one frozen Settings per brand. Keyword lists are
+lower-cased and compiled, platform toggles normalized and env vars resolved
+here, so the pipeline only reads attributes. Every problem found is reported
+in one ConfigError.
+"""
+import os, re, time, yaml
+from dataclasses import dataclass
+from pathlib import Path
+from brands import load_profiles
+from manipulation import normalize_platforms, _normalize_hashtags, PLATFORM_DEFAULTS
+from governor import ENDPOINTS
+
+PROVIDERS = ("openai", "grok", "ollama", "none")
+
+class ConfigError(ValueError):
+    pass
+
+@dataclass(slots=True, frozen=True)
+class Keywords:
+    """Lower-cased keywords plus one regex over all of them, so texts with no hit cost a single scan."""
+    words: tuple[str, ...]
+    any_re: re.Pattern | None
+
+    @classmethod
+    def compile(cls, words) -> "Keywords":
+        words = tuple(dict.fromkeys(str(w).strip().lower() for w in words or [] if str(w).strip()))
+        return cls(words, re.compile("|".join(map(re.escape, words))) if words else None)
+
+    def count(self, s: str) -> int:
+        """Distinct keywords occurring in s (already lower-cased)."""
+        if self.any_re is None or not self.any_re.search(s):
+            return 0
+        return sum(w in s for w in self.words)
+
+@dataclass(slots=True, frozen=True)
+class Voice:
+    style: str
+    audience: str
+
+@dataclass(slots=True, frozen=True)
+class RevenueFilter:
+    min_score: int
+    include: Keywords
+    exclude: Keywords
+    use_llm_second_pass: bool
+    low: float
+    high: float
+    min_examples: int
+
+@dataclass(slots=True, frozen=True)
+class LLMSettings:
+    provider: str
+    openai_model: str = "gpt-4o-mini"
+    openai_max_tokens: int = 500
+    grok_model: str = "grok-3-mini"
+    ollama_model: str = "llama3.1:8b"
+    xai_api_key: str | None = None
+
+@dataclass(slots=True, frozen=True)
+class HostSettings:
+    min_interval: float
+    session_ttl: int
+    workers: int
+
+@dataclass(slots=True, frozen=True)
+class WorkerSettings:
+    lease_seconds: int
+    retry_after: int
+
+@dataclass(slots=True, frozen=True)
+class BacklogSettings:
+    half_life_hours: float
+    max_age_days: float
+
+@dataclass(slots=True, frozen=True)
+class ImageSettings:
+    url: str | None
+    api_key: str | None
+    daily_budget: int
+    reuse_on_budget_exhausted: bool
+    reuse_max_age_days: float
+
+@dataclass(slots=True, frozen=True)
+class BackfillSettings:
+    provider: str
+    poll_seconds: float
+    lease_seconds: int
+
+@dataclass(slots=True, frozen=True)
+class PublishTarget:
+    repo: str
+    branch: str
+    token: str | None
+    site_base_url: str
+    permalink: str
+
+@dataclass(slots=True, frozen=True)
+class BufferTarget:
+    access_token: str
+    profile_ids: tuple[str, ...]
+    dry_run: bool = False   # log what would be posted instead of posting
+
+@dataclass(slots=True, frozen=True)
+class EndpointLimits:
+    initial: int
+    min: int
+    max: int
+
+@dataclass(slots=True, frozen=True)
+class GovernorSettings:
+    latency_factor: float
+    default: EndpointLimits
+    endpoints: dict[str, EndpointLimits]
+
+@dataclass(slots=True, frozen=True)
+class Paths:
+    db: Path
+    jobs: Path
+    model: Path
+    archive: Path
+    images: Path
+    governor: Path
+
+@dataclass(slots=True, frozen=True)
+class Settings:
+    brand_name: str
+    voice: Voice
+    hashtags: tuple[str, ...]
+    articles_per_run: int
+    feed_max_entries: int
+    max_attempts: int
+    feeds: tuple[str, ...]
+    hosts: HostSettings
+    workers: WorkerSettings
+    backlog: BacklogSettings
+    revenue_filter: RevenueFilter
+    tag_buckets: dict[str, re.Pattern]   # bucket -> regex matching any of its (lower-cased) keywords
+    platforms: dict                      # normalize_platforms() output
+    llm: LLMSettings
+    images: ImageSettings
+    backfill: BackfillSettings
+    publish: PublishTarget
+    buffer: BufferTarget | None          # None when Buffer posting is off
+    body_template: str
+    governor: GovernorSettings
+    paths: Paths
+
+class _Checker:
+    """Collects problems instead of stopping at the first one."""
+
+    def __init__(self, where: str):
+        self.where, self.errors = where, []
+
+    def fail(self, msg: str):
+        self.errors.append(f"{self.where}: {msg}")
+
+    def section(self, raw: dict, key: str) -> dict:
+        v = raw.get(key)
+        if v is None:
+            return {}
+        if not isinstance(v, dict):
+            self.fail(f"{key} must be a mapping")
+            return {}
+        return v
+
+    def num(self, d: dict, key: str, default, kind=float, lo=None, hi=None, label=None):
+        label = label or key
+        try:
+            v = kind(d.get(key, default))
+        except (TypeError, ValueError):
+            self.fail(f"{label} must be a number, got {d.get(key)!r}")
+            return kind(default)
+        if (lo is not None and v < lo) or (hi is not None and v > hi):
+            self.fail(f"{label} must be within [{lo}, {hi}], got {v}")
+        return v
+
+def _limits(c: _Checker, d: dict, label: str, base: EndpointLimits) -> EndpointLimits:
+    e = EndpointLimits(
+        initial=c.num(d, "initial", base.initial, int, lo=1, label=f"{label}.initial"),
+        min=c.num(d, "min", base.min, int, lo=1, label=f"{label}.min"),
+        max=c.num(d, "max", base.max, int, lo=1, label=f"{label}.max"),
+    )
+    if not e.min <= e.max:
+        c.fail(f"{label}: min must not exceed max")
+    return e
+
+def _env(value) -> str:
+    """Expand ${VAR}; anything left unexpanded counts as unset."""
+    v = os.path.expandvars(str(value or "")).strip()
+    return "" if "$" in v else v
+
+def compile_settings(raw: dict) -> Settings:
+    """One brand's merged config dict (with "paths" from load_profiles) -> Settings, or ConfigError."""
+    c = _Checker(f"brand {raw.get('brand_name')!r}")
+    brand = str(raw.get("brand_name") or "").strip()
+    if not brand:
+        c.fail("brand_name is required")
+
+    v = c.section(raw, "voice")
+    for k in ("style", "audience"):
+        if not str(v.get(k) or "").strip():
+            c.fail(f"voice.{k} is required")
+    voice = Voice(str(v.get("style") or ""), str(v.get("audience") or ""))
+
+    feeds = raw.get("feeds") or []
+    if not isinstance(feeds, list) or not feeds:
+        c.fail("feeds must be a non-empty list")
+        feeds = []
+    for f in feeds:
+        if not re.match(r"https?://[^/\s]+", str(f)):
+            c.fail(f"feed is not an http(s) URL: {f!r}")
+
+    rf = c.section(raw, "revenue_filter")
+    sp = c.section(rf, "second_pass")
+    for k in ("include_keywords", "exclude_keywords"):
+        if not isinstance(rf.get(k, []), list):
+            c.fail(f"revenue_filter.{k} must be a list")
+    low = c.num(sp, "low", 0.3, lo=0, hi=1, label="revenue_filter.second_pass.low")
+    high = c.num(sp, "high", 0.7, lo=0, hi=1, label="revenue_filter.second_pass.high")
+    if low > high:
+        c.fail("revenue_filter.second_pass.low must not exceed high")
+    include = Keywords.compile(rf.get("include_keywords") if isinstance(rf.get("include_keywords"), list) else [])
+    if not include.words:
+        c.fail("revenue_filter.include_keywords is empty; nothing would ever score")
+    revenue = RevenueFilter(
+        min_score=c.num(rf, "min_score", 2, int, label="revenue_filter.min_score"),
+        include=include,
+        exclude=Keywords.compile(rf.get("exclude_keywords") if isinstance(rf.get("exclude_keywords"), list) else []),
+        use_llm_second_pass=bool(rf.get("use_llm_second_pass", False)),
+        low=low, high=high,
+        min_examples=c.num(sp, "min_examples", 20, int, lo=1, label="revenue_filter.second_pass.min_examples"),
+    )
+
+    buckets = {}
+    for tag, kws in c.section(raw, "tag_buckets").items():
+        if not isinstance(kws, list):
+            c.fail(f"tag_buckets.{tag} must be a list of keywords")
+            continue
+        kw = Keywords.compile(kws)
+        if kw.any_re is not None:
+            buckets[str(tag)] = kw.any_re
+
+    platforms = raw.get("platforms", {})
+    names = platforms.keys() if isinstance(platforms, dict) else []
+    for name in names:
+        if name not in PLATFORM_DEFAULTS and name != "doc":
+            c.fail(f"unknown platform {name!r} (known: {', '.join(PLATFORM_DEFAULTS)})")
+
+    lc = c.section(raw, "llm")
+    provider = str(lc.get("provider", "none"))
+    if provider not in PROVIDERS:
+        c.fail(f"llm.provider must be one of {', '.join(PROVIDERS)}, got {provider!r}")
+    oc, gc, olc = c.section(lc, "openai"), c.section(lc, "grok"), c.section(lc, "ollama")
+    xai_key = os.getenv("XAI_API_KEY")
+    llm = LLMSettings(
+        provider=provider,
+        openai_model=str(oc.get("model", "gpt-4o-mini")),
+        openai_max_tokens=c.num(oc, "max_tokens", 500, int, lo=1, label="llm.openai.max_tokens"),
+        grok_model=str(gc.get("model", "grok-3-mini")),
+        ollama_model=str(olc.get("model", "llama3.1:8b")),
+        xai_api_key=xai_key,
+    )
+
+    bf = c.section(raw, "backfill")
+    backfill = BackfillSettings(
+        provider=str(bf.get("provider", provider)),
+        poll_seconds=c.num(bf, "poll_seconds", 30, lo=0, label="backfill.poll_seconds"),
+        # the lease has to outlive the batch completion window; nothing heartbeats it meanwhile
+        lease_seconds=int(c.num(bf, "lease_hours", 26, lo=0, label="backfill.lease_hours") * 3600),
+    )
+    if backfill.provider not in PROVIDERS:
+        c.fail(f"backfill.provider must be one of {', '.join(PROVIDERS)}, got {backfill.provider!r}")
+    # backfill.provider's key is only needed for --backfill runs; the batch client reports it then
+    if provider == "openai" and not os.getenv("OPENAI_API_KEY"):
+        c.fail("llm.provider openai needs OPENAI_API_KEY")
+    if provider == "grok" and not xai_key:
+        c.fail("llm.provider grok needs XAI_API_KEY")
+
+    ic = c.section(raw, "images")
+    images = ImageSettings(
+        url=os.getenv("IMAGE_GENERATION_URL"),
+        api_key=xai_key,
+        daily_budget=c.num(ic, "daily_budget", 50, int, lo=0, label="images.daily_budget"),
+        reuse_on_budget_exhausted=bool(ic.get("reuse_on_budget_exhausted", True)),
+        reuse_max_age_days=c.num(ic, "reuse_max_age_days", 30, lo=0, label="images.reuse_max_age_days"),
+    )
+    if images.daily_budget and not (images.url and images.api_key):
+        c.fail("image generation needs IMAGE_GENERATION_URL and XAI_API_KEY (or images.daily_budget: 0)")
+
+    pub = c.section(raw, "publish")
+    token_env = str(pub.get("token_env", "GITHUB_TOKEN"))
+    publish = PublishTarget(
+        repo=str(pub.get("repo") or os.getenv("GITHUB_PAGES_REPO", "user/repo")),  # e.g., "Subvertec/subvertec.github.io"
+        branch=str(pub.get("branch") or os.getenv("GITHUB_PAGES_BRANCH", "main")),
+        token=os.getenv(token_env),  # classic token with repo scope or a fine-grained token
+        site_base_url=str(pub.get("site_base_url") or os.getenv("SITE_BASE_URL", "https://example.com")),
+        permalink=os.getenv("JEKYLL_PERMALINK", "/:year/:month/:day/:title/"),
+    )
+    if not re.fullmatch(r"[\w.-]+/[\w.-]+", publish.repo):
+        c.fail(f"publish.repo must look like owner/repo, got {publish.repo!r}")
+    if not publish.token:
+        c.fail(f"publishing needs a GitHub token in ${token_env}")
+
+    post = c.section(raw, "post")
+    buf = c.section(post, "buffer")
+    token = _env(buf.get("access_token")) or os.getenv("BUFFER_ACCESS_TOKEN", "")
+    profiles = tuple(p for p in map(_env, buf.get("profile_ids") or []) if p) or \
+        tuple(p for p in [os.getenv("BUFFER_PROFILE_1", "")] if p)
+    # "auto": post whenever the token and a profile resolve, as before use_buffer existed
+    use_buffer = post.get("use_buffer", "auto")
+    buffer = None
+    if use_buffer not in (True, False, "auto"):
+        c.fail(f"post.use_buffer must be true, false or auto, got {use_buffer!r}")
+    elif use_buffer is True and not (token and profiles):
+        c.fail("post.use_buffer is on but the Buffer access token / profile ids don't resolve")
+    elif use_buffer is True or (use_buffer == "auto" and token and profiles):
+        buffer = BufferTarget(token, profiles, bool(post.get("dry_run", False)))
+
+    gc = c.section(raw, "governor")
+    default = _limits(c, gc, "governor", EndpointLimits(2, 1, 16))
+    endpoints = {}
+    for name, d in c.section(gc, "endpoints").items():
+        if name not in ENDPOINTS:
+            c.fail(f"unknown governor endpoint {name!r} (known: {', '.join(ENDPOINTS)})")
+        elif not isinstance(d, dict):
+            c.fail(f"governor.endpoints.{name} must be a mapping")
+        else:
+            endpoints[name] = _limits(c, d, f"governor.endpoints.{name}", default)
+    governor = GovernorSettings(c.num(gc, "latency_factor", 3.0, lo=1, label="governor.latency_factor"), default, endpoints)
+
+    h, w, bl = c.section(raw, "hosts"), c.section(raw, "workers"), c.section(raw, "backlog")
+    settings = Settings(
+        brand_name=brand,
+        voice=voice,
+        hashtags=tuple(_normalize_hashtags(raw.get("hashtags"))),
+        articles_per_run=c.num(raw, "articles_per_run", 1, int, lo=0),
+        feed_max_entries=c.num(raw, "feed_max_entries", 10, int, lo=1),
+        max_attempts=c.num(raw, "max_attempts", 3, int, lo=1),
+        feeds=tuple(str(f) for f in feeds),
+        hosts=HostSettings(
+            min_interval=c.num(h, "min_interval", 3.0, lo=0, label="hosts.min_interval"),
+            session_ttl=int(c.num(h, "session_ttl_hours", 12, lo=0, label="hosts.session_ttl_hours") * 3600),
+            workers=c.num(h, "workers", 4, int, lo=1, label="hosts.workers"),
+        ),
+        workers=WorkerSettings(
+            lease_seconds=c.num(w, "lease_seconds", 300, int, lo=10, label="workers.lease_seconds"),
+            retry_after=c.num(w, "retry_after_seconds", 600, int, lo=0, label="workers.retry_after_seconds"),
+        ),
+        backlog=BacklogSettings(
+            half_life_hours=c.num(bl, "half_life_hours", 24, lo=0.01, label="backlog.half_life_hours"),
+            max_age_days=c.num(bl, "max_age_days", 7, lo=0, label="backlog.max_age_days"),
+        ),
+        revenue_filter=revenue,
+        tag_buckets=buckets,
+        platforms=normalize_platforms(platforms),
+        llm=llm,
+        images=images,
+        backfill=backfill,
+        publish=publish,
+        buffer=buffer,
+        body_template=str(post.get("body_template", "jekyll_post.md.j2")),
+        governor=governor,
+        paths=Paths(**raw["paths"]),
+    )
+    if c.errors:
+        raise ConfigError("\n".join(c.errors))
+    return settings
+
+def load_settings(path: Path, data_folder: Path) -> list[Settings]:
+    """Read config.yaml and compile every brand; ConfigError lists all problems at once."""
+    try:
+        raw = yaml.safe_load(Path(path).read_text(encoding="utf-8"))
+    except (OSError, yaml.YAMLError) as e:
+        raise ConfigError(f"{path}: {e}") from e
+    if not isinstance(raw, dict):
+        raise ConfigError(f"{path}: expected a mapping at the top level")
+    errors, out = [], []
+    for prof in load_profiles(raw, data_folder):
+        try:
+            out.append(compile_settings(prof))
+        except ConfigError as e:
+            errors.append(str(e))
+    if errors:
+        raise ConfigError("\n".join(errors))
+    return out
+
+class ConfigWatcher:
+    """Holds the current settings and recompiles them when config.yaml's mtime changes.
+
+    A reload that fails validation is reported and the previous settings are
+    kept, so a long-running loop never picks up a half-edited file.
+    """
+
+    def __init__(self, path: Path, data_folder: Path):
+        self.path, self.data_folder = Path(path), Path(data_folder)
+        self._mtime = self.path.stat().st_mtime_ns
+        self.profiles = load_settings(self.path, self.data_folder)
+
+    def poll(self) -> bool:
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            self.profiles = load_settings(self.path, self.data_folder)
+        except ConfigError as e:
+            print(f">> config.yaml changed but is invalid; keeping previous settings:\n{e}", flush=True)
+            return False
+        print(f">> config.yaml reloaded at {time.strftime('%H:%M:%S')}", flush=True)
+        return True
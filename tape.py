@@ -0,0 +1,185 @@
+"""Record a real run's external traffic, then replay it offline.
+
+    python main.py --record data/tapes/slow-run            # normal run, everything captured
+    python main.py --replay data/tapes/slow-run --profile  # same inputs, no network
+
+Recording hooks the transport layer of httpx (feeds, articles, OpenAI) and
+requests (image generation/download, GitHub, Buffer), and wraps the LLM
+providers that don't speak HTTP (grok's gRPC SDK, ollama's CLI). It also
+snapshots config.yaml and the data folder (DBs, checkpoints, image store)
+as they were when the run started, so a replay makes the same decisions.
+
+A replayed request is matched by method, URL and request-body hash, then by
+method and URL alone (bodies that embed a date or upload boundary differ
+between runs); repeats are served in recorded order, the last one again once
+they run out. Anything not on the tape fails like a connection error. The
+clock used for post dates is shifted back to the recording's start.
+"""
+import json, time, shutil, hashlib, threading
+from collections import defaultdict
+from pathlib import Path
+import httpx, requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Set by install(); taped() and now() pass straight through otherwise.
+TAPE = None
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data or b"").hexdigest()
+
+class TapeMiss(ConnectionError):
+    pass
+
+class Tape:
+    """One recording: exchanges.jsonl + content-addressed bodies/, config.yaml and a data/ snapshot."""
+
+    def __init__(self, root, mode: str):
+        self.root, self.mode = Path(root), mode
+        self.bodies = self.root / "bodies"
+        self._lock = threading.Lock()
+        self._used = set()
+        self._exact, self._loose = defaultdict(list), defaultdict(list)
+        self.entries = []
+        self.shift = 0.0
+        if mode == "record":
+            self.bodies.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.root / "exchanges.jsonl", "a", encoding="utf-8")
+        else:
+            with open(self.root / "exchanges.jsonl", encoding="utf-8") as f:
+                self.entries = [json.loads(line) for line in f if line.strip()]
+            for i, e in enumerate(self.entries):
+                self._exact[(e["kind"], e["method"], e["url"], e["req"])].append(i)
+                self._loose[(e["kind"], e["method"], e["url"])].append(i)
+            self.meta = json.loads((self.root / "meta.json").read_text(encoding="utf-8"))
+            self.shift = time.time() - self.meta["recorded_at"]
+
+    @classmethod
+    def record(cls, root, config_path: Path, data_folder: Path) -> "Tape":
+        root = Path(root)
+        if (root / "exchanges.jsonl").exists():
+            raise FileExistsError(f"{root} already holds a recording")
+        root.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(config_path, root / "config.yaml")
+        data_folder = Path(data_folder).resolve()
+        if data_folder.exists():
+            # outputs and recordings (this one included) aren't inputs to the run
+            skip = {data_folder / n for n in ("archive", "tapes", "profile")} | {root.resolve()}
+            shutil.copytree(data_folder, root / "data",
+                            ignore=lambda d, names: [n for n in names if Path(d).resolve() / n in skip])
+        (root / "meta.json").write_text(json.dumps({"recorded_at": time.time()}), encoding="utf-8")
+        return cls(root, "record")
+
+    @classmethod
+    def replay(cls, root) -> "Tape":
+        return cls(root, "replay")
+
+    def replay_data(self) -> Path:
+        """Fresh copy of the recorded data folder; a replay never touches the recording itself."""
+        work = self.root / "replay-data"
+        shutil.rmtree(work, ignore_errors=True)
+        if (self.root / "data").exists():
+            shutil.copytree(self.root / "data", work)
+        else:
+            work.mkdir(parents=True)
+        return work
+
+    def _save(self, kind, method, url, req_body: bytes, status, headers, body: bytes, extra=None):
+        h = _sha(body)
+        path = self.bodies / h[:2] / h
+        entry = {"kind": kind, "method": method, "url": url, "req": _sha(req_body),
+                 "status": status, "headers": headers, "body": h, **(extra or {})}
+        with self._lock:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(body)
+            self._log.write(json.dumps(entry) + "\n")
+            self._log.flush()
+
+    def _find(self, kind, method, url, req_body: bytes) -> tuple[dict, bytes]:
+        with self._lock:
+            for ids in (self._exact.get((kind, method, url, _sha(req_body))), self._loose.get((kind, method, url))):
+                if not ids:
+                    continue
+                fresh = [i for i in ids if i not in self._used]
+                i = fresh[0] if fresh else ids[-1]
+                self._used.add(i)
+                e = self.entries[i]
+                return e, (self.bodies / e["body"][:2] / e["body"]).read_bytes()
+        raise TapeMiss(f"not on tape: {method} {url}")
+
+    def httpx_exchange(self, request: httpx.Request, send) -> httpx.Response:
+        body = request.read()
+        if self.mode == "replay":
+            e, raw = self._find("httpx", request.method, str(request.url), body)
+        else:
+            resp = send()
+            try:
+                raw = b"".join(resp.stream)  # still encoded; the client decodes it as usual
+            finally:
+                resp.close()
+            e = {"status": resp.status_code, "headers": resp.headers.multi_items(),
+                 "http_version": resp.extensions.get("http_version", b"HTTP/1.1").decode()}
+            self._save("httpx", request.method, str(request.url), body, e["status"], e["headers"], raw,
+                       {"http_version": e["http_version"]})
+        return httpx.Response(e["status"], headers=e["headers"], stream=httpx.ByteStream(raw), request=request,
+                              extensions={"http_version": e.get("http_version", "HTTP/1.1").encode()})
+
+    def requests_exchange(self, request, send) -> requests.Response:
+        body = request.body or b""
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        if not isinstance(body, bytes):
+            body = b""  # streamed upload; matched by method + URL
+        if self.mode == "replay":
+            e, content = self._find("requests", request.method, request.url, body)
+        else:
+            resp = send()
+            content = resp.content  # decoded, so Content-Encoding is dropped below
+            headers = [[k, v] for k, v in resp.headers.items() if k.lower() not in ("content-encoding", "content-length")]
+            e = {"status": resp.status_code, "headers": headers, "reason": resp.reason}
+            self._save("requests", request.method, request.url, body, e["status"], headers, content, {"reason": resp.reason})
+        r = requests.Response()
+        r.status_code, r.reason = e["status"], e.get("reason") or ""
+        r.headers = CaseInsensitiveDict({k: v for k, v in e["headers"]})
+        r.encoding = get_encoding_from_headers(r.headers)
+        r._content, r._content_consumed = content, True
+        r.url, r.request = request.url, request
+        return r
+
+    def call(self, name: str, key: str, fn) -> str:
+        """Record/replay a non-HTTP call that returns text (an LLM completion)."""
+        key_b = key.encode("utf-8")
+        if self.mode == "replay":
+            _, body = self._find("call", name, name, key_b)
+            return body.decode("utf-8")
+        out = fn()
+        self._save("call", name, name, key_b, 0, [], out.encode("utf-8"))
+        return out
+
+    def close(self):
+        if self.mode == "record":
+            self._log.close()
+        print(f">> Tape {self.mode}: {self.root}", flush=True)
+
+def install(tape: Tape):
+    """Route every httpx/requests request of this process through the tape."""
+    global TAPE
+    TAPE = tape
+    httpx_send = httpx.HTTPTransport.handle_request
+    requests_send = requests.adapters.HTTPAdapter.send
+
+    def handle_request(self, request):
+        return tape.httpx_exchange(request, lambda: httpx_send(self, request))
+
+    def send(self, request, **kw):
+        return tape.requests_exchange(request, lambda: requests_send(self, request, **kw))
+
+    httpx.HTTPTransport.handle_request = handle_request
+    requests.adapters.HTTPAdapter.send = send
+
+def taped(name: str, key: str, fn) -> str:
+    return TAPE.call(name, key, fn) if TAPE is not None else fn()
+
+def now() -> float:
+    """Wall clock, or the recording's clock while replaying."""
+    return time.time() - (TAPE.shift if TAPE is not None else 0.0)
@@ -0,0 +1,36 @@
+import gzip
+import json
+import pytest
+from archive import Archive
+
+@pytest.fixture
+def archive(tmp_path):
+    a = Archive(tmp_path, segment_bytes=300)
+    yield a
+    a.close()
+
+def test_append_get_and_iter(archive):
+    for i in range(6):
+        archive.append(f"a{i % 3}", {"n": i, "text": "x" * 50})
+    assert len(archive._segments()) > 1  # rotated at segment_bytes
+    assert [r["n"] for r in archive.get("a1")] == [1, 4]
+    assert [r["n"] for r in archive.iter_records()] == list(range(6))
+    assert sorted(archive.ids()) == ["a0", "a1", "a2"]
+
+def test_segments_stream_as_jsonl(archive):
+    archive.append("a", {"n": 1})
+    archive.append("b", {"n": 2})
+    (seg,) = archive._segments()
+    with gzip.open(seg, "rt", encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == ["a", "b"]
+
+def test_truncated_tail_is_dropped_before_the_next_append(archive):
+    archive.append("a", {"n": 1})
+    (seg,) = archive._segments()
+    with open(seg, "ab") as f:  # a crash halfway through writing a member
+        f.write(gzip.compress(b'{"id": "lost"}\n')[:12])
+    with pytest.raises(EOFError):
+        list(archive.iter_records())
+    archive.append("b", {"n": 2})
+    assert [r["id"] for r in archive.iter_records()] == ["a", "b"]
+    assert archive.get("b")[0]["n"] == 2
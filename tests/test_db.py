@@ -0,0 +1,70 @@
+import time
+import pytest
+import db
+
+@pytest.fixture
+def con(tmp_path):
+    c = db.init_db(tmp_path / "content.db")
+    yield c
+    c.close()
+
+def _backlog(con, *rows):
+    for uid, score, age_h in rows:
+        db.potential_articles(con, uid, f"https://site.test/{uid}", uid, score, published_at=int(time.time() - age_h * 3600))
+
+def test_claim_promotes_backlog_by_decayed_priority(con):
+    # 10 points a day old (half-life 24h) is worth 5: less than a fresh 6
+    _backlog(con, ("old", 10, 24), ("new", 6, 0), ("low", 1, 0))
+    assert db.claim_job(con, "w1", 60, min_score=2)["id"] == "new"
+    assert db.claim_job(con, "w2", 60, min_score=2)["id"] == "old"
+    assert db.claim_job(con, "w3", 60, min_score=2) is None  # "low" is under min_score
+
+def test_claim_skips_leased_jobs_and_reclaims_expired_ones(con):
+    _backlog(con, ("a", 5, 0))
+    assert db.claim_job(con, "w1", 60, 2)["id"] == "a"
+    assert db.claim_job(con, "w2", 60, 2) is None
+    con.execute("UPDATE jobs SET lease_expires=0 WHERE id='a'")
+    con.commit()
+    job = db.claim_job(con, "w2", 60, 2)
+    assert (job["id"], job["state"]) == ("a", "selected")
+    assert not db.renew_lease(con, "a", "w1", 60)
+    assert db.renew_lease(con, "a", "w2", 60)
+
+def test_set_job_state_is_fenced_by_lease_owner(con):
+    _backlog(con, ("a", 5, 0))
+    db.claim_job(con, "w1", 60, 2)
+    db.set_job_state(con, "a", "extracted", "w1")
+    con.execute("UPDATE jobs SET lease_expires=0 WHERE id='a'")
+    con.commit()
+    db.claim_job(con, "w2", 60, 2)
+    with pytest.raises(db.LeaseLost):
+        db.set_job_state(con, "a", "rewritten", "w1")
+    assert db.get_job(con, "a")["state"] == "extracted"
+    db.set_job_state(con, "a", "rewritten", "w2")
+    assert db.get_job(con, "a")["state"] == "rewritten"
+
+def test_released_lease_with_retry_after_holds_the_job(con):
+    _backlog(con, ("a", 5, 0))
+    db.claim_job(con, "w1", 60, 2)
+    db.fail_job(con, "a", "boom", max_attempts=3)
+    db.release_lease(con, "a", "w1", retry_after=600)
+    assert db.claim_job(con, "w2", 60, 2) is None
+    db.release_lease(con, "a", "w1")
+    assert db.claim_job(con, "w2", 60, 2)["attempts"] == 1
+
+def test_owned_jobs_returns_only_unfinished_jobs_of_that_owner(con):
+    _backlog(con, ("a", 5, 0), ("b", 4, 0))
+    db.claim_job(con, "backfill:h", 60, 2)
+    db.claim_job(con, "w1", 60, 2)
+    assert [j["id"] for j in db.owned_jobs(con, "backfill:h", 600)] == ["a"]
+    db.set_job_state(con, "a", "posted", "backfill:h")
+    assert db.owned_jobs(con, "backfill:h", 600) == []
+
+def test_relevance_cursor_picks_up_rows_from_the_same_second(con):
+    db.mark_processed(con, "p1", "u1", "first")
+    db.potential_articles(con, "n1", "u2", "reject", 0)
+    texts, labels, cursor = db.relevance_training_rows(con, 2, (0, 0))
+    assert (texts, labels) == (["first", "reject"], [1, 0])
+    db.mark_processed(con, "p2", "u3", "second")
+    texts, labels, cursor = db.relevance_training_rows(con, 2, cursor)
+    assert (texts, labels) == (["second"], [1])
@@ -0,0 +1,46 @@
+import xml.etree.ElementTree as ET
+import httpx
+import pytest
+from feeds import parse_feed_stream, fetch_feed_entries, published_ts
+
+RSS = b"""<?xml version="1.0"?><rss><channel><title>t</title>""" + b"".join(
+    b"<item><title>Item %d</title><link>https://site.test/%d</link>"
+    b"<pubDate>Mon, 19 Oct 2026 0%d:00:00 GMT</pubDate></item>" % (i, i, i) for i in range(5)
+) + b"</channel></rss>"
+
+ATOM = b"""<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">
+<entry><title>A</title><id>urn:a</id><link rel="self" href="https://x.test/self"/>
+<link href="https://x.test/a"/><updated>2026-10-19T01:00:00Z</updated></entry>
+</feed>"""
+
+def _chunks(data: bytes, n: int = 7):
+    return (data[i:i + n] for i in range(0, len(data), n))
+
+def test_rss_stops_after_max_entries():
+    seen = []
+    def chunks():
+        for c in _chunks(RSS):
+            seen.append(c)
+            yield c
+    entries = parse_feed_stream(chunks(), max_entries=2)
+    assert [e["title"] for e in entries] == ["Item 0", "Item 1"]
+    assert entries[0]["link"] == entries[0]["guid"] == "https://site.test/0"
+    assert published_ts(entries[1]["published"]) == 1792371600
+    assert sum(map(len, seen)) < len(RSS)  # the rest of the body was never read
+
+def test_atom_prefers_alternate_link_and_id():
+    (e,) = parse_feed_stream(_chunks(ATOM), max_entries=10)
+    assert (e["title"], e["link"], e["guid"]) == ("A", "https://x.test/a", "urn:a")
+    assert published_ts(e["published"]) == 1792371600
+
+def test_malformed_xml_raises_parse_error():
+    with pytest.raises(ET.ParseError):
+        parse_feed_stream([b"<rss><channel><item><title>x & y</title></item></channel></rss>"])
+
+def test_fetch_falls_back_to_feedparser_on_malformed_feed():
+    body = RSS.replace(b"<title>Item 3</title>", b"<title>Item 3 & more</title>")
+    client = httpx.Client(transport=httpx.MockTransport(
+        lambda req: httpx.Response(200, stream=httpx.ByteStream(body))))
+    entries = fetch_feed_entries(client, "https://feed.test/rss", max_entries=10)
+    assert [e["link"] for e in entries] == [f"https://site.test/{i}" for i in range(5)]
+    assert entries[3]["title"].startswith("Item 3")
@@ -0,0 +1,98 @@
+import json
+import time
+import pytest
+import governor
+from governor import Governor, Limiter, throttled, _seconds
+from settings import EndpointLimits, GovernorSettings
+
+def _respond(lim, status=200, headers=None, took=0.0):
+    started = lim.acquire()
+    lim.release(started - took, status, headers)
+
+def test_successes_grow_the_limit_by_one_per_window():
+    lim = Limiter("x", initial=2, hi=16)
+    for _ in range(2):
+        _respond(lim, took=0.01)
+    assert lim.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    for _ in range(300):
+        _respond(lim, took=0.01)
+    assert lim.limit == 16  # capped at hi
+
+def test_throttling_halves_once_per_round_trip():
+    lim = Limiter("x", initial=8)
+    for _ in range(5):
+        _respond(lim, took=0.01)
+    before = lim.limit
+    _respond(lim, 429, {"retry-after": "0"})
+    _respond(lim, 429, {"retry-after": "0"})  # same round trip: counted, not cut again
+    assert lim.limit == pytest.approx(before / 2)
+    assert lim.counts["throttled"] == 2
+
+def test_errors_and_5xx_cut_but_never_below_lo():
+    lim = Limiter("x", initial=4, lo=2)
+    lim.latency = 0.0  # no round-trip guard between the cuts below
+    _respond(lim, 500)
+    started = lim.acquire()
+    lim.release(started, None, None, failed=True)
+    assert lim.limit == 2
+    assert lim.counts["errors"] == 2
+
+def test_latency_past_factor_times_baseline_cuts():
+    lim = Limiter("x", initial=8, latency_factor=3.0)
+    for _ in range(10):
+        _respond(lim, took=0.01)
+    before = lim.limit
+    for _ in range(10):
+        _respond(lim, took=0.5)
+    assert lim.limit < before and lim.counts["slow"] >= 1
+
+def test_retry_after_and_exhausted_rate_headers_hold_new_requests():
+    lim = Limiter("x")
+    _respond(lim, 429, {"retry-after": "0.2"})
+    t = time.monotonic()
+    lim.release(lim.acquire())
+    assert time.monotonic() - t >= 0.15
+    _respond(lim, 200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "5s"})
+    assert lim.hold_until - time.monotonic() > 4
+
+def test_remaining_caps_the_limit():
+    lim = Limiter("x", initial=8)
+    _respond(lim, 200, {"x-ratelimit-remaining": "3"})
+    assert lim.limit == 3
+
+def test_throttled_recognises_github_secondary_limit():
+    assert throttled(429) and throttled(503)
+    assert throttled(403, {"retry-after": "60"})
+    assert throttled(403, {"x-ratelimit-remaining": "0"})
+    assert not throttled(403, {}) and not throttled(200)
+
+@pytest.mark.parametrize("value, seconds", [("12", 12), ("1.5", 1.5), ("6m0s", 360), ("250ms", 0.25), ("junk", None)])
+def test_seconds_parses_reset_formats(value, seconds):
+    assert _seconds(value) == seconds
+
+def test_request_retries_only_idempotent_methods(monkeypatch):
+    calls = []
+    def fake(method, url, **kw):
+        calls.append(method)
+        r = governor.requests.Response()
+        r.status_code, r.headers["retry-after"] = 429, "0"
+        return r
+    monkeypatch.setattr(governor.requests, "request", fake)
+    assert governor.request("buffer", "POST", "https://x.test").status_code == 429
+    assert calls == ["POST"]
+    governor.request("github", "GET", "https://x.test")
+    assert calls[1:] == ["GET"] * 4
+    calls.clear()
+    governor.request("xai-images", "POST", "https://x.test", retries=1)
+    assert calls == ["POST"] * 2
+
+def test_governor_uses_endpoint_limits_and_warm_starts(tmp_path):
+    path = tmp_path / "governor.json"
+    path.write_text(json.dumps({"github": {"limit": 6.7}}))
+    g = Governor()
+    g.configure(GovernorSettings(3.0, EndpointLimits(2, 1, 16), {"github": EndpointLimits(2, 1, 8)}), path)
+    assert g.limiter("github").limit == 6 and g.limiter("github").hi == 8
+    assert g.limiter("buffer").limit == 2 and g.ceiling("buffer") == 16
+    g.save()
+    assert json.loads(path.read_text())["github"]["limit"] == 6
+    assert 'governor_limit{endpoint="github"} 6' in (tmp_path / "governor.prom").read_text()
@@ -0,0 +1,49 @@
+import time
+import multiprocessing as mp
+import pytest
+from PIL import Image
+import image_store
+from image_store import ImageStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    def fake_download(url, dest):
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (16, 16), url).save(dest, "PNG")
+        return dest
+    monkeypatch.setattr(image_store, "download_image", fake_download)
+    s = ImageStore(tmp_path)
+    yield s
+    s.close()
+
+def _day_ago() -> int:
+    return int(time.time()) - 86400
+
+def test_reserve_stops_at_budget_and_release_hands_back(store):
+    slots = [store.reserve(3, _day_ago()) for _ in range(4)]
+    assert None not in slots[:3] and slots[3] is None
+    store.release(slots[0])
+    assert store.generated_since(_day_ago()) == 2
+    assert store.reserve(3, _day_ago()) is not None
+
+def _reserve_many(root) -> int:
+    s = ImageStore(root)
+    try:
+        return sum(s.reserve(10, _day_ago()) is not None for _ in range(5))
+    finally:
+        s.close()
+
+def test_reserve_is_atomic_across_processes(tmp_path):
+    with mp.get_context("spawn").Pool(4) as pool:
+        assert sum(pool.map(_reserve_many, [tmp_path] * 4)) == 10
+
+def test_lookup_by_prompt_and_by_brand_article(store):
+    path = store.add_from_url("a  Prompt", ["cloud"], "red", "art1", "BrandA")
+    assert store.lookup("A prompt") == path                       # whitespace/case normalised
+    assert store.lookup("new prompt", "art1", "BrandA") == path   # a re-run's new prompt maps back
+    assert store.lookup("other prompt", "art1", "BrandB") is None
+
+def test_recent_for_tags_shares_a_bucket(store):
+    path = store.add_from_url("p", ["cloud", "security"], "red", "art1", "BrandA")
+    assert store.recent_for_tags(["security"]) == path
+    assert store.recent_for_tags(["ai"]) is None
@@ -0,0 +1,70 @@
+import copy
+from pathlib import Path
+import pytest
+import yaml
+from brands import load_profiles
+from settings import compile_settings, load_settings, ConfigError
+
+CONFIG = Path(__file__).resolve().parent.parent / "config.yaml"
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    for k, v in {"XAI_API_KEY": "x", "GITHUB_TOKEN": "t", "GITHUB_PAGES_REPO": "owner/site",
+                 "IMAGE_GENERATION_URL": "https://img.test/gen"}.items():
+        monkeypatch.setenv(k, v)
+    for k in ("OPENAI_API_KEY", "BUFFER_ACCESS_TOKEN", "BUFFER_PROFILE_1"):
+        monkeypatch.delenv(k, raising=False)
+
+@pytest.fixture
+def raw(tmp_path):
+    return load_profiles(yaml.safe_load(CONFIG.read_text(encoding="utf-8")), tmp_path)[0]
+
+def _errors(raw) -> str:
+    with pytest.raises(ConfigError) as e:
+        compile_settings(raw)
+    return str(e.value)
+
+def test_shipped_config_compiles(tmp_path):
+    (s,) = load_settings(CONFIG, tmp_path)
+    assert s.brand_name and s.feeds and s.revenue_filter.include.words
+    assert s.paths.db == tmp_path / "content.db"
+    assert s.buffer is None  # use_buffer: auto without Buffer credentials
+
+def test_all_problems_are_reported_at_once(raw):
+    raw["feeds"] = ["ftp://nope"]
+    raw["revenue_filter"]["second_pass"] = {"low": 0.9, "high": 0.2}
+    raw["llm"]["provider"] = "gpt"
+    raw["platforms"] = {"myspace": {}}
+    msg = _errors(raw)
+    assert "feed is not an http(s) URL: 'ftp://nope'" in msg
+    assert "revenue_filter.second_pass.low must not exceed high" in msg
+    assert "llm.provider must be one of" in msg and "'gpt'" in msg
+    assert "unknown platform 'myspace'" in msg
+
+def test_number_errors_name_the_setting(raw):
+    raw["workers"] = {"lease_seconds": "soon"}
+    raw["images"]["daily_budget"] = -1
+    msg = _errors(raw)
+    assert "workers.lease_seconds must be a number, got 'soon'" in msg
+    assert "images.daily_budget must be within [0, None], got -1" in msg
+
+def test_live_provider_needs_its_key_but_backfill_provider_does_not(raw):
+    raw["llm"]["provider"] = "openai"
+    assert "llm.provider openai needs OPENAI_API_KEY" in _errors(raw)
+    raw = copy.deepcopy(raw)
+    raw["llm"]["provider"] = "grok"
+    raw["backfill"] = {"provider": "openai"}
+    assert compile_settings(raw).backfill.provider == "openai"
+
+def test_buffer_modes(raw, monkeypatch):
+    raw["post"]["use_buffer"] = True
+    assert "Buffer access token / profile ids don't resolve" in _errors(raw)
+    monkeypatch.setenv("BUFFER_ACCESS_TOKEN", "tok")
+    monkeypatch.setenv("BUFFER_PROFILE_1", "p1")
+    raw["post"].update(use_buffer="auto", dry_run=True)
+    buf = compile_settings(raw).buffer
+    assert (buf.access_token, buf.profile_ids, buf.dry_run) == ("tok", ("p1",), True)
+    raw["post"]["use_buffer"] = False
+    assert compile_settings(raw).buffer is None
+    raw["post"]["use_buffer"] = "yes"
+    assert "post.use_buffer must be true, false or auto" in _errors(raw)
@@ -0,0 +1,87 @@
+import os, time, socket, threading
+from db import init_db, claim_job, renew_lease, release_lease, fail_job, LeaseLost
+from pipeline import run_job
+
+class Heartbeat:
+    """Keeps one job's lease alive from a background thread with its own DB connection."""
+
+    def __init__(self, db_path, uid: str, worker: str, lease_seconds: int):
+        self.db_path, self.uid, self.worker, self.lease_seconds = db_path, uid, worker, lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        deadline = time.time() + self.lease_seconds  # the lease was claimed just before this thread started
+        wait, con = self.lease_seconds / 3, None
+        try:
+            while not self._stop.wait(wait):
+                try:
+                    con = con or init_db(self.db_path)
+                    if not renew_lease(con, self.uid, self.worker, self.lease_seconds):
+                        self.lost.set()
+                        return
+                    deadline, wait = time.time() + self.lease_seconds, self.lease_seconds / 3
+                except Exception as e:  # e.g. "database is locked" past the busy timeout
+                    print(f">> [{self.worker}] heartbeat for {self.uid} failed: {e}", flush=True)
+                    if time.time() >= deadline:
+                        self.lost.set()
+                        return
+                    wait = min(self.lease_seconds / 3, 5)
+        finally:
+            if con is not None:
+                con.close()
+
+    def check(self):
+        if self.lost.is_set():
+            raise LeaseLost(f"lease on {self.uid} expired; another worker may own it")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_worker(cfg, db_path, jobs_folder, limit: int | None = None) -> int:
+    """Claim and process jobs until the backlog is empty or `limit` jobs were attempted.
+
+    Safe to run in many processes, on one host or several sharing db_path:
+    each job is leased, the lease is heartbeated while stages run, and every
+    stage re-checks the lease so a worker that stalled past expiry stops
+    before another one publishes. `processed` stays the completion marker.
+    """
+    lease_seconds, retry_after = cfg.workers.lease_seconds, cfg.workers.retry_after
+    bl = cfg.backlog
+    me = worker_id()
+
+    con = init_db(db_path)
+    done = 0
+    try:
+        while limit is None or done < limit:
+            job = claim_job(con, me, lease_seconds, cfg.revenue_filter.min_score,
+                            bl.half_life_hours, bl.max_age_days)
+            if job is None:
+                print(f">> [{me}] backlog empty", flush=True)
+                break
+            done += 1
+            backoff = 0
+            print(f"\n=== [{me}] {job['title']} ===\n{job['url']}  [state: {job['state']}]", flush=True)
+            with Heartbeat(db_path, job["id"], me, lease_seconds) as hb:
+                try:
+                    run_job(con, cfg, job, jobs_folder, guard=hb.check, owner=me)
+                except LeaseLost as e:
+                    print(f"Stopping: {e}", flush=True)
+                    continue
+                except Exception as e:
+                    print(f"Job failed at '{job['state']}': {e} (will resume next run)", flush=True)
+                    fail_job(con, job["id"], str(e), cfg.max_attempts)
+                    backoff = retry_after  # don't let this (or another) worker retry it straight away
+            release_lease(con, job["id"], me, backoff)
+    finally:
+        con.close()
+    return done